@@ -2,10 +2,11 @@
 
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
-import requests
 import os
 from dotenv import load_dotenv
 
+from services.keycloak import request_token
+
 load_dotenv()
 
 
@@ -20,9 +21,7 @@ class LoginRequest(BaseModel):
     password: str
 
 @router.post("/login", summary="Autentication with Keycloak", description="Get access and refresh tokens using Keycloak's password grant flow.")
-def login(data: LoginRequest):
-    KEYCLOAK_URL = os.getenv("KEYCLOAK_URL")
-    REALM_NAME = os.getenv("REALM_NAME")
+async def login(data: LoginRequest):
     CLIENT_ID = os.getenv("CLIENT_ID")
     CLIENT_SECRET = os.getenv("CLIENT_SECRET")
     """
@@ -37,8 +36,6 @@ def login(data: LoginRequest):
     - access_token
     - refresh_token
     """
-    token_url = f"{KEYCLOAK_URL}/realms/{REALM_NAME}/protocol/openid-connect/token"
-
     payload = {
         "grant_type": "password",
         "client_id": CLIENT_ID,
@@ -47,9 +44,7 @@ def login(data: LoginRequest):
         "password": data.password,
     }
 
-    headers = {"Content-Type": "application/x-www-form-urlencoded"}
-
-    response = requests.post(token_url, data=payload, headers=headers)
+    response = await request_token(payload)
 
     if response.status_code != 200:
         try:
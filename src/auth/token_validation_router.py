@@ -1,10 +1,11 @@
 from fastapi import APIRouter, Depends, HTTPException
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from jose import jwt, JWTError, ExpiredSignatureError
-import requests
 import os
 from dotenv import load_dotenv
 
+from services.jwks import get_keycloak_issuer, jwks_store
+
 load_dotenv()
 
 
@@ -21,17 +22,10 @@ def validate_local_token(credentials: HTTPAuthorizationCredentials = Depends(sec
     token = credentials.credentials
     unverified_header = jwt.get_unverified_header(token)
 
-    KEYCLOAK_URL = os.getenv("KEYCLOAK_URL", "http://localhost:8080")
-    REALM_NAME = os.getenv("REALM_NAME", "aclimate")
     CLIENT_ID = os.getenv("CLIENT_ID", "dummy-client")
 
-    jwks_url = f"{KEYCLOAK_URL}/realms/{REALM_NAME}/protocol/openid-connect/certs"
-    response = requests.get(jwks_url)
-    if response.status_code != 200:
-        raise HTTPException(status_code=500, detail="Error fetching JWKS from Keycloak")
-    jwks = response.json()
-
-    key = next((k for k in jwks["keys"] if k["kid"] == unverified_header["kid"]), None)
+    # Keys come from the shared, pre-parsed JWKS store
+    key = jwks_store.get_signing_key(unverified_header.get("kid"), unverified_header.get("alg"))
     if not key:
         raise HTTPException(status_code=401, detail="Public key not found")
 
@@ -41,7 +35,7 @@ def validate_local_token(credentials: HTTPAuthorizationCredentials = Depends(sec
             key,
             algorithms=[unverified_header["alg"]],
             audience="account",
-            issuer=f"{KEYCLOAK_URL}/realms/{REALM_NAME}",
+            issuer=get_keycloak_issuer(),
         )
 
         filtered_payload = {
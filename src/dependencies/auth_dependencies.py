@@ -1,12 +1,17 @@
 from fastapi import Depends, HTTPException
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from jose import jwt, JWTError, ExpiredSignatureError
-import requests
+from collections import OrderedDict
+import copy
+import hashlib
 import os
-import time
 import logging
+import threading
+import time
 from dotenv import load_dotenv
-from typing import List
+from typing import List, Optional
+
+from services.jwks import get_keycloak_issuer, jwks_store
 
 logger = logging.getLogger(__name__)
 
@@ -15,36 +20,58 @@ load_dotenv()
 
 security = HTTPBearer()
 
-# JWKS cache: stores {"keys": [...], "cached_at": float}
-_jwks_cache: dict = {}
-_JWKS_TTL_SECONDS = int(os.getenv("JWKS_TTL_SECONDS", 300))
+# Maximum number of verified tokens kept in memory
+TOKEN_CACHE_MAX_ENTRIES = int(os.getenv("TOKEN_CACHE_MAX_ENTRIES", "10000"))
 
 
-def get_jwks():
-    keycloak_url = os.getenv("KEYCLOAK_URL", "http://localhost:8080")
-    realm_name = os.getenv("REALM_NAME", "aclimate")
-    now = time.monotonic()
-    if _jwks_cache.get("keys") and now - _jwks_cache.get("cached_at", 0) < _JWKS_TTL_SECONDS:
-        return {"keys": _jwks_cache["keys"]}
-
-    jwks_url = f"{keycloak_url}/realms/{realm_name}/protocol/openid-connect/certs"
-    headers = {
-        "User-Agent": "Mozilla/5.0 (compatible; AclimateAPI/3.0)",
-        "Accept": "application/json",
-    }
-    try:
-        response = requests.get(jwks_url, timeout=10, headers=headers)
-    except requests.exceptions.RequestException as e:
-        logger.error(f"Error de conexión al obtener JWKS: {e}")
-        raise HTTPException(status_code=503, detail=f"No se pudo obtener las claves públicas (JWKS): {str(e)}")
-    if response.status_code != 200:
-        logger.error(f"JWKS respondió {response.status_code}: {response.text}")
-        raise HTTPException(status_code=503, detail=f"No se pudo obtener las claves públicas (JWKS): status {response.status_code}")
+class VerifiedTokenCache:
+    """
+    Thread-safe LRU cache of verified token claims, keyed by the SHA-256 of
+    the token and kept only until the token's exp.
+    """
+
+    def __init__(self, max_entries: int = TOKEN_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, dict]" = OrderedDict()
+
+    @staticmethod
+    def make_key(token: str) -> str:
+        return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+    def get(self, token: str) -> Optional[dict]:
+        """Return a copy of the cached claims, or None if missing or expired."""
+        key = self.make_key(token)
+        with self._lock:
+            payload = self._entries.get(key)
+            if payload is None:
+                return None
+            if payload["exp"] <= time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+        return copy.deepcopy(payload)
+
+    def put(self, token: str, payload: dict) -> None:
+        if self.max_entries <= 0 or not isinstance(payload.get("exp"), (int, float)):
+            return
+        key = self.make_key(token)
+        with self._lock:
+            self._entries[key] = copy.deepcopy(payload)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+token_cache = VerifiedTokenCache()
 
-    data = response.json()
-    _jwks_cache["keys"] = data["keys"]
-    _jwks_cache["cached_at"] = now
-    return data
+def get_jwks():
+    """Return the realm's JWKS document from the shared key store."""
+    return {"keys": jwks_store.get_key_set().keys}
 
 
 def _resolve_token_type(payload: dict) -> str:
@@ -61,25 +88,28 @@ def _resolve_token_type(payload: dict) -> str:
 
 def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)) -> dict:
     token = credentials.credentials
+
+    # Repeat tokens skip the signature check until they expire
+    cached = token_cache.get(token)
+    if cached is not None:
+        return cached
+
     unverified_header = jwt.get_unverified_header(token)
 
-    jwks = get_jwks()
-    key = next((k for k in jwks["keys"] if k["kid"] == unverified_header["kid"]), None)
+    key = jwks_store.get_signing_key(unverified_header.get("kid"), unverified_header.get("alg"))
     if not key:
         raise HTTPException(status_code=401, detail="Clave pública no encontrada")
 
-    keycloak_url = os.getenv("KEYCLOAK_URL", "http://localhost:8080")
-    realm_name = os.getenv("REALM_NAME", "aclimate")
-
     try:
         payload = jwt.decode(
             token,
             key,
             algorithms=[unverified_header["alg"]],
             audience="account",
-            issuer=f"{keycloak_url}/realms/{realm_name}",
+            issuer=get_keycloak_issuer(),
         )
         payload["token_type"] = _resolve_token_type(payload)
+        token_cache.put(token, payload)
         return payload
 
     except ExpiredSignatureError:
@@ -1,3 +1,4 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Depends
 from aclimate_v3_orm.migrations import upgrade, current, downgrade
 from dependencies.auth_dependencies import get_current_user
@@ -28,17 +29,40 @@ from auth.get_client_token import router as get_client_token_router
 # Geoserver route
 from routes.get_geoserver_point_data import router as get_geoserver_point_data_router
 from routes.get_geoserver_raster import router as get_geoserver_raster_router
+from routes.get_geoserver_stats import router as get_geoserver_stats_router
 # Periods route
 from routes.get_available_periods import router as get_available_periods_router
 # Country climate measures route
 from routes.get_climate_measures_by_country import router as get_climate_measures_by_country_router
 from fastapi.middleware.cors import CORSMiddleware
 from aclimate_v3_orm.database.base import create_tables
+from services.geoserver import close_geoserver_session, open_geoserver_session
+from services.geoserver_client import close_async_geoserver_client
+from services.export_jobs import export_jobs
+from services.jwks import jwks_store
+from services.keycloak import close_keycloak_client
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    open_geoserver_session()
+    export_jobs.start()
+    # Keep the Keycloak signing keys fresh outside the request path
+    jwks_store.start()
+    yield
+    await jwks_store.stop()
+    await export_jobs.stop()
+    # Release shared connection pools
+    await close_async_geoserver_client()
+    await close_keycloak_client()
+    close_geoserver_session()
+
 
 app = FastAPI(
     title="Aclimate v3 API",
     version="3.0",
-    description="API for Aclimate including various administrative levels and climate data."
+    description="API for Aclimate including various administrative levels and climate data.",
+    lifespan=lifespan,
 )
 
 
@@ -87,6 +111,7 @@ app.include_router(get_climate_historical_daily_by_date_ranges_and_all_measures_
 # Geoserver router
 app.include_router(get_geoserver_point_data_router, dependencies=_auth)
 app.include_router(get_geoserver_raster_router, dependencies=_auth)
+app.include_router(get_geoserver_stats_router, dependencies=_auth)
 
 # Periods router
 app.include_router(get_available_periods_router, dependencies=_auth)
@@ -1,39 +1,19 @@
 from fastapi import APIRouter, Depends, HTTPException
 from typing import List, Optional, Dict
 import os
-import httpx
 from dependencies.auth_dependencies import require_roles
 from schemas.auth import Credential, UserCreateRequest
+from services.keycloak import admin_tokens, get_admin_url, get_keycloak_client
 
 router = APIRouter(
     prefix="/users",
     tags=["Webadmin"]
 )
 
-# Environment variables
-KEYCLOAK_URL = os.getenv("KEYCLOAK_URL")
-REALM_NAME = os.getenv("REALM_NAME")
-CLIENT_ID = os.getenv("CLIENT_ID")
-CLIENT_SECRET = os.getenv("CLIENT_SECRET")
-
 
 async def get_admin_token():
-    """Get a token using client credentials grant."""
-    data = {
-        "grant_type": "client_credentials",
-        "client_id": CLIENT_ID,
-        "client_secret": CLIENT_SECRET,
-    }
-    headers = {"Content-Type": "application/x-www-form-urlencoded"}
-    url = f"{KEYCLOAK_URL}/realms/{REALM_NAME}/protocol/openid-connect/token"
-
-    async with httpx.AsyncClient() as client:
-        response = await client.post(url, data=data, headers=headers)
-
-    if response.status_code != 200:
-        print("Keycloak error:", response.text)
-        raise HTTPException(status_code=401, detail="Invalid client credentials")
-    return response.json()["access_token"]
+    """Get a token using client credentials grant, cached until shortly before it expires."""
+    return await admin_tokens.get_token(os.getenv("CLIENT_ID"), os.getenv("CLIENT_SECRET"))
 
 
 # @router.post("/create-user", summary="Create a Keycloak user and assign webadminsimple role")
@@ -41,6 +21,7 @@ async def get_admin_token():
 #     request: UserCreateRequest,
 #     current_user: dict = Depends(require_roles(["adminsuper"]))
 # ):
+#     CLIENT_ID = os.getenv("CLIENT_ID")
 #     token = await get_admin_token()
 # 
 #     user_payload = {
@@ -55,56 +36,57 @@ async def get_admin_token():
 #     }
 # 
 # 
-#     async with httpx.AsyncClient() as client:
-#         # Step 1: Create the user
-#         create_resp = await client.post(
-#             f"{KEYCLOAK_URL}/admin/realms/{REALM_NAME}/users",
-#             headers={"Authorization": f"Bearer {token}"},
-#             json=user_payload,
-#         )
-#         if create_resp.status_code not in (201, 204):
-#             print("User creation error:", create_resp.text)
-#             raise HTTPException(status_code=500, detail="Failed to create user")
+#     admin_url = get_admin_url()
+#     client = get_keycloak_client()
+#     # Step 1: Create the user
+#     create_resp = await client.post(
+#         f"{admin_url}/users",
+#         headers={"Authorization": f"Bearer {token}"},
+#         json=user_payload,
+#     )
+#     if create_resp.status_code not in (201, 204):
+#         print("User creation error:", create_resp.text)
+#         raise HTTPException(status_code=500, detail="Failed to create user")
 # 
-#         # Step 2: Retrieve the user ID
-#         users_resp = await client.get(
-#             f"{KEYCLOAK_URL}/admin/realms/{REALM_NAME}/users?username={request.username}",
-#             headers={"Authorization": f"Bearer {token}"}
-#         )
-#         if users_resp.status_code != 200 or not users_resp.json():
-#             raise HTTPException(status_code=500, detail="Failed to retrieve user ID")
-#         user_id = users_resp.json()[0]["id"]
+#     # Step 2: Retrieve the user ID
+#     users_resp = await client.get(
+#         f"{admin_url}/users?username={request.username}",
+#         headers={"Authorization": f"Bearer {token}"}
+#     )
+#     if users_resp.status_code != 200 or not users_resp.json():
+#         raise HTTPException(status_code=500, detail="Failed to retrieve user ID")
+#     user_id = users_resp.json()[0]["id"]
 # 
-#         # Step 3: Get client ID by clientId name
-#         client_resp = await client.get(
-#             f"{KEYCLOAK_URL}/admin/realms/{REALM_NAME}/clients?clientId={CLIENT_ID}",
-#             headers={"Authorization": f"Bearer {token}"}
-#         )
-#         if client_resp.status_code != 200 or not client_resp.json():
-#             raise HTTPException(status_code=500, detail="Failed to retrieve client ID")
-#         client_id = client_resp.json()[0]["id"]
+#     # Step 3: Get client ID by clientId name
+#     client_resp = await client.get(
+#         f"{admin_url}/clients?clientId={CLIENT_ID}",
+#         headers={"Authorization": f"Bearer {token}"}
+#     )
+#     if client_resp.status_code != 200 or not client_resp.json():
+#         raise HTTPException(status_code=500, detail="Failed to retrieve client ID")
+#     client_id = client_resp.json()[0]["id"]
 # 
-#         # Step 4: Get the webadminsimple role from the client
-#         role_resp = await client.get(
-#             f"{KEYCLOAK_URL}/admin/realms/{REALM_NAME}/clients/{client_id}/roles/webadminsimple",
-#             headers={"Authorization": f"Bearer {token}"}
-#         )
-#         if role_resp.status_code != 200:
-#             raise HTTPException(status_code=500, detail="Failed to retrieve 'webadminsimple' role")
-#         role_data = role_resp.json()
-#         
-#         # Step 5: Assign the role to the user
-#         assign_resp = await client.post(
-#             f"{KEYCLOAK_URL}/admin/realms/{REALM_NAME}/users/{user_id}/role-mappings/clients/{client_id}",
-#             headers={"Authorization": f"Bearer {token}"},
-#             json=[{
-#                 "id": role_data["id"],
-#                 "name": role_data["name"]
-#             }]
-#         )
-#         if assign_resp.status_code not in (204, 201):
-#             print("Role assignment error:", assign_resp.text)
-#             raise HTTPException(status_code=500, detail="Failed to assign 'webadminsimple' role")
+#     # Step 4: Get the webadminsimple role from the client
+#     role_resp = await client.get(
+#         f"{admin_url}/clients/{client_id}/roles/webadminsimple",
+#         headers={"Authorization": f"Bearer {token}"}
+#     )
+#     if role_resp.status_code != 200:
+#         raise HTTPException(status_code=500, detail="Failed to retrieve 'webadminsimple' role")
+#     role_data = role_resp.json()
+#     
+#     # Step 5: Assign the role to the user
+#     assign_resp = await client.post(
+#         f"{admin_url}/users/{user_id}/role-mappings/clients/{client_id}",
+#         headers={"Authorization": f"Bearer {token}"},
+#         json=[{
+#             "id": role_data["id"],
+#             "name": role_data["name"]
+#         }]
+#     )
+#     if assign_resp.status_code not in (204, 201):
+#         print("Role assignment error:", assign_resp.text)
+#         raise HTTPException(status_code=500, detail="Failed to assign 'webadminsimple' role")
 # 
 #     return {
 #         "message": "User created and 'webadminsimple' role assigned successfully",
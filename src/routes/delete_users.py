@@ -1,7 +1,7 @@
 from fastapi import APIRouter, Depends, HTTPException
-import os
-import httpx
 from dependencies.auth_dependencies import require_roles
+from routes.createuser import get_admin_token
+from services.keycloak import get_admin_url, get_keycloak_client
 from schemas.auth import DeleteUserRequest
 
 router = APIRouter(
@@ -9,30 +9,6 @@ router = APIRouter(
     tags=["Webadmin"]
 )
 
-# Environment variables
-KEYCLOAK_URL = os.getenv("KEYCLOAK_URL")
-REALM_NAME = os.getenv("REALM_NAME")
-CLIENT_ID = os.getenv("CLIENT_ID")
-CLIENT_SECRET = os.getenv("CLIENT_SECRET")
-
-
-async def get_admin_token():
-    """Obtain an access token using client credentials."""
-    data = {
-        "grant_type": "client_credentials",
-        "client_id": CLIENT_ID,
-        "client_secret": CLIENT_SECRET,
-    }
-    headers = {"Content-Type": "application/x-www-form-urlencoded"}
-    url = f"{KEYCLOAK_URL}/realms/{REALM_NAME}/protocol/openid-connect/token"
-
-    async with httpx.AsyncClient() as client:
-        response = await client.post(url, data=data, headers=headers)
-
-    if response.status_code != 200:
-        raise HTTPException(status_code=401, detail="Failed to obtain admin token")
-    return response.json()["access_token"]
-
 
 # @router.delete("/delete-user", summary="Delete a user from Keycloak by ID")
 # async def delete_user(
@@ -41,18 +17,19 @@ async def get_admin_token():
 # ):
 #     token = await get_admin_token()
 # 
-#     async with httpx.AsyncClient() as client:
-#         delete_resp = await client.delete(
-#             f"{KEYCLOAK_URL}/admin/realms/{REALM_NAME}/users/{request.user_id}",
-#             headers={"Authorization": f"Bearer {token}"}
-#         )
+#     admin_url = get_admin_url()
+#     client = get_keycloak_client()
+#     delete_resp = await client.delete(
+#         f"{admin_url}/users/{request.user_id}",
+#         headers={"Authorization": f"Bearer {token}"}
+#     )
 # 
-#         if delete_resp.status_code == 204:
-#             return {"message": f"User with ID '{request.user_id}' was successfully deleted"}
-#         elif delete_resp.status_code == 404:
-#             raise HTTPException(status_code=404, detail="User not found")
-#         else:
-#             raise HTTPException(
-#                 status_code=delete_resp.status_code,
-#                 detail=f"Failed to delete user: {delete_resp.text}"
-#             )
+#     if delete_resp.status_code == 204:
+#         return {"message": f"User with ID '{request.user_id}' was successfully deleted"}
+#     elif delete_resp.status_code == 404:
+#         raise HTTPException(status_code=404, detail="User not found")
+#     else:
+#         raise HTTPException(
+#             status_code=delete_resp.status_code,
+#             detail=f"Failed to delete user: {delete_resp.text}"
+#         )
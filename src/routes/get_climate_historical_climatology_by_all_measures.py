@@ -1,40 +1,46 @@
-from fastapi import APIRouter, Query
-from typing import List
-from aclimate_v3_orm.services.climate_historical_climatology_service import ClimateHistoricalClimatologyService
-from schemas.climate import ClimateHistoricalMonthRecord
+from fastapi import APIRouter, Query, Request
+from fastapi.responses import JSONResponse
+from typing import List, Literal, Union
+from schemas.climate import ClimateHistoricalMonthColumns, ClimateHistoricalMonthRecord
+from services.climate_historical import (
+    build_climatology_month_range_query,
+    get_climatology_by_month_range,
+    get_stream_media_type,
+    streaming_response,
+    to_columnar,
+)
 
 router = APIRouter(tags=["Climate Historical Climatology"], prefix="/climatology")
 
-@router.get("/by-month-range-location-ids-all-measures", response_model=List[ClimateHistoricalMonthRecord])
+@router.get("/by-month-range-location-ids-all-measures", response_model=Union[List[ClimateHistoricalMonthRecord], ClimateHistoricalMonthColumns])
 def get_climatology_by_month_range_location_ids_all_measures(
+    request: Request,
     location_ids: str = Query(..., description="Comma-separated location IDs, e.g. '1,2,3'"),
-    start_month: int = Query(..., description="Start month (1-12)"),
-    end_month: int = Query(..., description="End month (1-12)")
+    start_month: int = Query(..., ge=1, le=12, description="Start month (1-12)"),
+    end_month: int = Query(..., ge=1, le=12, description="End month (1-12)"),
+    response_format: Literal["records", "columnar"] = Query("records", alias="format", description="'records' (one object per row) or 'columnar' (parallel arrays)")
 ):
     """
     Returns climatology data for specific location IDs and all measures within a month range.
     - **location_ids**: Comma-separated list of location IDs.
     - **start_month**: Start month (1-12).
     - **end_month**: End month (1-12).
+    - **format**: 'records' (default) returns one object per row; 'columnar' returns
+      a ClimateHistoricalMonthColumns with locations and measures listed once plus parallel arrays.
+
+    Send `Accept: application/x-ndjson` or `Accept: text/csv` to stream the rows
+    in chunks straight from the database instead of a single JSON document.
+
+    If start_month is greater than end_month the range wraps around the year end,
+    e.g. start_month=11 and end_month=2 returns November through February.
     """
-    service = ClimateHistoricalClimatologyService()
     ids = [int(lid.strip()) for lid in location_ids.split(",")]
 
-    result = []
-    for loc_id in ids:
-        data = service.get_by_location_id(loc_id)
-        for d in data:
-            if start_month <= d.month <= end_month:
-                result.append(ClimateHistoricalMonthRecord(
-                    id=d.id,
-                    location_id=d.location_id,
-                    location_name=d.location.name if d.location else None,
-                    measure_id=d.measure_id,
-                    measure_name=d.measure.name if d.measure else None,
-                    measure_short_name=d.measure.short_name if d.measure else None,
-                    measure_unit=d.measure.unit if d.measure else None,
-                    month=d.month,
-                    value=d.value
-                ))
+    media_type = get_stream_media_type(request.headers.get("accept"))
+    if media_type:
+        return streaming_response(build_climatology_month_range_query(ids, start_month, end_month), media_type, "climatology", "month")
 
-    return result
+    rows = get_climatology_by_month_range(ids, start_month, end_month)
+    if response_format == "columnar":
+        return JSONResponse(to_columnar(rows, "month"))
+    return [ClimateHistoricalMonthRecord.model_validate(row) for row in rows]
@@ -1,41 +1,44 @@
-from fastapi import APIRouter, Query
-from typing import List
+from fastapi import APIRouter, Query, Request
+from fastapi.responses import JSONResponse
+from typing import List, Literal, Union
 from datetime import date
-from aclimate_v3_orm.services import ClimateHistoricalMonthlyService
-from schemas.climate import ClimateHistoricalDateRecord
+from schemas.climate import ClimateHistoricalDateColumns, ClimateHistoricalDateRecord
+from services.climate_historical import (
+    build_monthly_date_range_query,
+    get_monthly_by_date_range,
+    get_stream_media_type,
+    streaming_response,
+    to_columnar,
+)
 
 router = APIRouter(tags=["Climate Historical Monthly"], prefix="/historical-monthly")
 
-@router.get("/by-date-range-all-measures", response_model=List[ClimateHistoricalDateRecord])
+@router.get("/by-date-range-all-measures", response_model=Union[List[ClimateHistoricalDateRecord], ClimateHistoricalDateColumns])
 def get_by_date_range_all_measures(
+    request: Request,
     location_ids: str = Query(..., description="Comma-separated location IDs, e.g. '1,2,3'"),
     start_date: date = Query(date(2025, 5, 1), description="Start date", examples="2025-05-01"),
-    end_date: date = Query(date(2025, 5, 26), description="End date", examples="2025-06-01")
+    end_date: date = Query(date(2025, 5, 26), description="End date", examples="2025-06-01"),
+    response_format: Literal["records", "columnar"] = Query("records", alias="format", description="'records' (one object per row) or 'columnar' (parallel arrays)")
 ):
     """
     Returns monthly climate data for multiple location IDs and all measures within a date range.
     - **location_ids**: Comma-separated list of location IDs.
     - **start_date**: Start date for the range of monthly climate data.
     - **end_date**: End date for the range of monthly climate data.
+    - **format**: 'records' (default) returns one object per row; 'columnar' returns
+      a ClimateHistoricalDateColumns with locations and measures listed once plus parallel arrays.
+
+    Send `Accept: application/x-ndjson` or `Accept: text/csv` to stream the rows
+    in chunks straight from the database instead of a single JSON document.
     """
-    service = ClimateHistoricalMonthlyService()
     ids = [int(lid.strip()) for lid in location_ids.split(",")]
 
-    result = []
-    for loc_id in ids:
-        data = service.get_by_location_id(loc_id)
-        for d in data:
-            if start_date <= d.date <= end_date:
-                result.append(ClimateHistoricalDateRecord(
-                    id=d.id,
-                    location_id=d.location_id,
-                    location_name=d.location.name if d.location else None,
-                    measure_id=d.measure_id,
-                    measure_name=d.measure.name if d.measure else None,
-                    measure_short_name=d.measure.short_name if d.measure else None,
-                    measure_unit=d.measure.unit if d.measure else None,
-                    date=d.date,
-                    value=d.value
-                ))
+    media_type = get_stream_media_type(request.headers.get("accept"))
+    if media_type:
+        return streaming_response(build_monthly_date_range_query(ids, start_date, end_date), media_type, "historical_monthly", "date")
 
-    return result
+    rows = get_monthly_by_date_range(ids, start_date, end_date)
+    if response_format == "columnar":
+        return JSONResponse(to_columnar(rows, "date"))
+    return [ClimateHistoricalDateRecord.model_validate(row) for row in rows]
@@ -1,22 +1,27 @@
 from fastapi import APIRouter, Query, HTTPException
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 from datetime import date, timedelta
-import requests
+import asyncio
 import numpy as np
 import logging
-from rasterio.io import MemoryFile
-from concurrent.futures import ThreadPoolExecutor, as_completed
 
-from schemas.geoserver import Coordinate, PointDataRequest, PointDataResult, PointDataResponse
+from schemas.geoserver import (
+    Coordinate, PointDataRequest, PointDataResult, PointDataResponse, PointTimeSeriesResponse,
+)
 
 from services.geoserver import (
+    cluster_coordinates,
     generate_date_list,
+    get_coordinates_bbox,
     get_geoserver_auth,
     get_geoserver_url,
-    get_geoserver_session,
-    download_raster,
-    MAX_WORKERS,
+    get_max_dates_for_temporality,
+    BBox,
+    POINT_TIMESERIES_BATCH_SIZE,
+    POINT_TIMESERIES_MAX_WINDOWS,
 )
+from services.geoserver_governor import GeoServerUnavailable
+from services.raster import get_decoded_raster, sample_points
 
 router = APIRouter(tags=["Geoserver"], prefix="/geoserver")
 
@@ -24,74 +29,38 @@ router = APIRouter(tags=["Geoserver"], prefix="/geoserver")
 logger = logging.getLogger(__name__)
 
 
-def process_date_data(date_info: Dict, coordinates: List[List[float]],
-                      workspace: str, store: str) -> List[PointDataResult]:
+async def process_date_data(date_info: Dict, coordinates: List[List[float]],
+                            workspace: str, store: str,
+                            bbox: Optional[BBox] = None) -> List[PointDataResult]:
     """
     Process data for a specific date and return results for all coordinates.
-    Uses the shared GeoServer session for connection pooling.
+    Uses the shared async GeoServer client for connection pooling, and only
+    downloads the window covering bbox when one is given.
     """
     results = []
     current_date, date_str, time_subset = date_info['date'], date_info['date_str'], date_info['time_subset']
 
-    # Use shared session for download
-    session = get_geoserver_session()
-    _, raster_bytes = download_raster(workspace, store, time_subset, session)
-
-    if raster_bytes is None:
-        logger.warning("No data available for date %s", date_str)
-        return results
-
     try:
-        # Process the raster and extract values for each coordinate
-        with MemoryFile(raster_bytes) as memfile:
-            with memfile.open() as raster:
-                data_array = raster.read(1)
-
-                for coord in coordinates:
-                    lon, lat = coord[0], coord[1]
-
-                    try:
-                        # Check if coordinate is within bounds
-                        if not (raster.bounds.left <= lon <= raster.bounds.right and
-                                raster.bounds.bottom <= lat <= raster.bounds.top):
-                            continue
-
-                        # Get value from specific point
-                        row, col = raster.index(lon, lat)
-
-                        # Check if indices are within raster dimensions
-                        if row < 0 or row >= raster.height or col < 0 or col >= raster.width:
-                            continue
-
-                        value = data_array[row, col]
-
-                        # If the exact pixel is NaN, try nearby pixels
-                        if np.isnan(value):
-                            # Check 3x3 neighborhood
-                            found_valid = False
-                            for dr in [-1, 0, 1]:
-                                for dc in [-1, 0, 1]:
-                                    nr, nc = row + dr, col + dc
-                                    if (0 <= nr < raster.height and 0 <= nc < raster.width):
-                                        nearby_value = data_array[nr, nc]
-                                        if not np.isnan(nearby_value) and nearby_value != -9999:
-                                            value = nearby_value
-                                            found_valid = True
-                                            break
-                                if found_valid:
-                                    break
-
-                        # Filter invalid values
-                        if not np.isnan(value) and value != -9999 and (raster.nodata is None or value != raster.nodata):
-                            results.append(PointDataResult(
-                                coordinate=[lon, lat],
-                                date=date_str,
-                                value=float(value),
-                            ))
-
-                    except Exception:
-                        continue
-
+        # Decoded bands of past periods are cached
+        raster = await get_decoded_raster(workspace, store, time_subset, bbox,
+                                          cache=date_info.get('cacheable', False))
+        if raster is None:
+            logger.warning("No data available for date %s", date_str)
+            return results
+
+        # Sample every coordinate at once
+        values = sample_points(raster.band, raster.transform, raster.nodata, coordinates)
+
+        for coord, value in zip(coordinates, values):
+            if not np.isnan(value):
+                results.append(PointDataResult(
+                    coordinate=[coord[0], coord[1]],
+                    date=date_str,
+                    value=float(value),
+                ))
+
+    except GeoServerUnavailable:
+        raise
     except Exception as e:
         logger.error("Error processing raster for %s: %s", date_str, e)
 
@@ -99,7 +68,7 @@ def process_date_data(date_info: Dict, coordinates: List[List[float]],
 
 
 @router.post("/point-data", response_model=PointDataResponse)
-def get_point_data_from_coordinates(
+async def get_point_data_from_coordinates(
     request: PointDataRequest
 ):
     """
@@ -129,6 +98,7 @@ def get_point_data_from_coordinates(
                 'date': current_date,
                 'date_str': entry['date_str'],
                 'time_subset': entry['time_subset'],
+                'cacheable': entry['cacheable'],
             })
             # Advance the current_date for the 'date' field tracking
             if request.temporality == "daily":
@@ -141,28 +111,21 @@ def get_point_data_from_coordinates(
             elif request.temporality == "annual":
                 current_date = current_date.replace(year=current_date.year + 1)
 
-        # Process dates in parallel
-        all_results = []
-        with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
-            # Submit all tasks
-            future_to_date = {
-                executor.submit(
-                    process_date_data,
-                    date_info,
-                    request.coordinates,
-                    request.workspace,
-                    request.store,
-                ): date_info for date_info in dates_to_process
-            }
-
-            # Collect results as they complete
-            for future in as_completed(future_to_date):
-                try:
-                    results = future.result()
-                    all_results.extend(results)
-                except Exception as exc:
-                    logger.error("Error processing date: %s", exc)
-                    continue
+        # Only request the window that covers the coordinates
+        bbox = get_coordinates_bbox(request.coordinates) if request.coordinates else None
+
+        # Process dates concurrently on the event loop; the shared client
+        # limits how many GeoServer requests are in flight
+        date_results = await asyncio.gather(*(
+            process_date_data(
+                date_info,
+                request.coordinates,
+                request.workspace,
+                request.store,
+                bbox,
+            ) for date_info in dates_to_process
+        ))
+        all_results = [result for results in date_results for result in results]
 
         # Sort results chronologically by date
         all_results.sort(key=lambda x: x.date)
@@ -174,6 +137,107 @@ def get_point_data_from_coordinates(
 
     except HTTPException:
         raise
+    except GeoServerUnavailable as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         logger.error("Error processing point data request: %s", str(e))
-        raise HTTPException(status_code=500, detail=f"Error processing data: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Error processing data: {str(e)}")
+
+
+async def sample_window(date_info: Dict, coordinates: List[List[float]],
+                        workspace: str, store: str, bbox: BBox) -> Optional[np.ndarray]:
+    """Sample the coordinates of one cluster for one date, None if the date has no data."""
+    try:
+        raster = await get_decoded_raster(workspace, store, date_info['time_subset'], bbox,
+                                          cache=date_info.get('cacheable', False))
+        if raster is None:
+            return None
+        return sample_points(raster.band, raster.transform, raster.nodata, coordinates)
+    except GeoServerUnavailable:
+        raise
+    except Exception as e:
+        logger.error("Error processing raster for %s: %s", date_info['date_str'], e)
+        return None
+
+
+@router.post(
+    "/point-timeseries",
+    response_model=PointTimeSeriesResponse,
+    responses={
+        400: {
+            "description": "Bad request - too many dates requested",
+            "content": {
+                "application/json": {
+                    "example": {"detail": "Maximum 366 dates allowed for 'daily' temporality. Requested 400."}
+                }
+            }
+        }
+    }
+)
+async def get_point_timeseries(request: PointDataRequest):
+    """
+    Gets a time series per coordinate from a raster within a date range.
+
+    Nearby coordinates are grouped and each group is downloaded as one small
+    window per date, instead of one full coverage per date. Coordinates
+    spread over more than POINT_TIMESERIES_MAX_WINDOWS groups share a single
+    window covering all of them, like /point-data.
+
+    - **coordinates**: List of coordinates [[lon, lat], [lon, lat]]
+    - **start_date**: Start date of the range
+    - **end_date**: End date of the range
+    - **workspace**: Geoserver workspace
+    - **store**: Geoserver store/mosaic
+    - **temporality**: Time frequency - "daily", "monthly", or "annual" (default: "daily")
+
+    Returns the dates once and, for every coordinate, one value per date
+    (null where there is no data).
+    """
+    end_date = request.end_date if request.end_date else request.start_date
+    dates = generate_date_list(request.start_date, end_date, request.temporality)
+
+    max_dates = get_max_dates_for_temporality(request.temporality, "timeseries")
+    if len(dates) > max_dates:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Maximum {max_dates} dates allowed for '{request.temporality}' temporality. "
+                   f"Requested {len(dates)}.",
+        )
+
+    get_geoserver_auth()
+
+    coordinates = request.coordinates
+
+    clusters = [
+        (indices, [coordinates[i] for i in indices])
+        for indices in cluster_coordinates(coordinates, max_clusters=POINT_TIMESERIES_MAX_WINDOWS)
+    ]
+    windows = [get_coordinates_bbox(cluster) for _, cluster in clusters]
+
+    # One sample per (date, cluster), processed in batches so only a bounded
+    # number of windows is downloaded and decoded at a time
+    values = np.full((len(coordinates), len(dates)), np.nan)
+    tasks = [(d, c) for d in range(len(dates)) for c in range(len(clusters))]
+    for start in range(0, len(tasks), POINT_TIMESERIES_BATCH_SIZE):
+        batch = tasks[start:start + POINT_TIMESERIES_BATCH_SIZE]
+        try:
+            samples = await asyncio.gather(*(
+                sample_window(dates[d], clusters[c][1], request.workspace, request.store, windows[c])
+                for d, c in batch
+            ))
+        except GeoServerUnavailable as e:
+            raise HTTPException(status_code=503, detail=str(e))
+        for (date_index, cluster_index), sampled in zip(batch, samples):
+            if sampled is not None:
+                values[clusters[cluster_index][0], date_index] = sampled
+
+    return {
+        "dates": [d['date_str'] for d in dates],
+        "series": [
+            {
+                "coordinate": [coord[0], coord[1]],
+                "values": [None if np.isnan(v) else float(v) for v in row],
+            }
+            for coord, row in zip(coordinates, values)
+        ],
+    }
@@ -1,27 +1,33 @@
-from fastapi import APIRouter, HTTPException
-from fastapi.responses import StreamingResponse
-from typing import List, Optional, Dict
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
+from starlette.background import BackgroundTask
+from typing import AsyncIterator, Callable, Iterable, List, Optional, Dict, Tuple
+from collections import deque
+from contextlib import suppress
 from datetime import date
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import asyncio
 import logging
+import os
+import tempfile
+import zipfile
 import zipstream
-import rioxarray
-from rasterio.io import MemoryFile
+from starlette.concurrency import run_in_threadpool
 
-from aclimate_v3_cut_spatial_data import RioGeoServerClipper
-from aclimate_v3_cut_spatial_data.types.geometry_types import GeoServerConnection
-
-from schemas.geoserver import RasterExportRequest, ClipConfig
+from dependencies.auth_dependencies import get_current_user
+from schemas.geoserver import RasterExportRequest, RasterExportJobStatus, ClipConfig
 
 from services.geoserver import (
     generate_date_list,
     get_geoserver_auth,
-    get_geoserver_url,
-    get_geoserver_session,
     get_max_dates_for_temporality,
-    download_raster,
-    MAX_WORKERS,
+    RASTER_EXPORT_LOOKAHEAD,
 )
+from services.geoserver_client import get_async_geoserver_client
+from services.geoserver_governor import GeoServerUnavailable
+from services.clip import clip_geotiff
+from services.raster import to_cog
+from services.cube import NETCDF_MEDIA_TYPE, NetCDFCubeWriter, data_variable_name
+from services.export_jobs import ExportJob, ExportJobQueueFull, JOB_COMPLETED, export_jobs
 
 router = APIRouter(tags=["Geoserver"], prefix="/geoserver")
 
@@ -30,47 +36,179 @@ logger = logging.getLogger(__name__)
 
 
 # ---------- Funciones auxiliares ----------
-def process_single_date(date_info: Dict, workspace: str, store: str,
-                        clip_config: Optional[ClipConfig]) -> tuple:
-    """Download a raster for a single date, optionally clip it, return (date_str, bytes)."""
+def clip_raster(raster_bytes: bytes, clip_config: ClipConfig) -> bytes:
+    """
+    Clip a GeoTIFF to the configured GeoServer boundary layer and return the new GeoTIFF.
+
+    The boundary geometries and their rasterized mask are cached, so every
+    date of an export on the same grid reuses one vector fetch and one mask.
+    """
+    geoserver = clip_config.geoserver
+    return clip_geotiff(raster_bytes, geoserver.workspace, geoserver.layer, geoserver.cql_filter)
+
+
+def convert_raster(raster_bytes: bytes, clip_config: Optional[ClipConfig], cog: bool) -> bytes:
+    """Apply the requested clip and COG conversion to a downloaded GeoTIFF."""
+    if clip_config and clip_config.enabled and clip_config.geoserver:
+        raster_bytes = clip_raster(raster_bytes, clip_config)
+    if cog:
+        raster_bytes = to_cog(raster_bytes)
+    return raster_bytes
+
+
+async def process_single_date(date_info: Dict, workspace: str, store: str,
+                              clip_config: Optional[ClipConfig], cog: bool = False) -> tuple:
+    """
+    Download a raster for a single date, optionally clip it and convert it
+    to a Cloud-Optimized GeoTIFF, return (date_str, bytes).
+    """
     time_subset = date_info["time_subset"]
     date_str = date_info["date_str"]
 
-    # Use shared session for download
-    session = get_geoserver_session()
-    _, raster_bytes = download_raster(workspace, store, time_subset, session)
+    # Use the shared async client for download
+    client = get_async_geoserver_client()
+    _, raster_bytes = await client.download_raster(workspace, store, time_subset,
+                                                   cache=date_info.get("cacheable", False))
 
     if raster_bytes is None:
         return date_str, None
 
-    if clip_config and clip_config.enabled and clip_config.geoserver:
+    clip = clip_config and clip_config.enabled and clip_config.geoserver
+    if clip or cog:
         try:
-            with MemoryFile(raster_bytes) as memfile:
-                xds = rioxarray.open_rasterio(memfile)
-                if xds.rio.crs is None:
-                    xds = xds.rio.write_crs("EPSG:4326")
-
-            conn = GeoServerConnection(
-                base_url=get_geoserver_url(),
-                auth=get_geoserver_auth(),
-            )
-            clipper = RioGeoServerClipper(xds)
-            clipper.connection = conn
-            clipped = clipper.clip(
-                workspace=clip_config.geoserver.workspace,
-                layer=clip_config.geoserver.layer,
-                cql_filter=clip_config.geoserver.cql_filter,
-            )
-            with MemoryFile() as mem_out:
-                clipped.rio.to_raster(mem_out)
-                raster_bytes = mem_out.read()
+            # Clipping and encoding are CPU bound, run them in the shared threadpool
+            raster_bytes = await run_in_threadpool(convert_raster, raster_bytes, clip_config, cog)
         except Exception as e:
-            logger.warning("Clip failed for %s: %s", date_str, e)
+            logger.warning("Raster conversion failed for %s: %s", date_str, e)
             return date_str, None
 
     return date_str, raster_bytes
 
 
+async def iter_date_results(date_list: List[Dict], workspace: str, store: str,
+                            clip_config: Optional[ClipConfig], cog: bool = False,
+                            lookahead: int = RASTER_EXPORT_LOOKAHEAD,
+                            on_date_done: Optional[Callable[[], None]] = None,
+                            ) -> AsyncIterator[Tuple[str, bytes]]:
+    """
+    Yield (date_str, bytes) in chronological order, skipping dates without data.
+
+    At most `lookahead` dates are downloaded and clipped ahead of the one being
+    consumed, so memory stays bounded while later dates are still being fetched.
+    Pending downloads are cancelled if the consumer stops early.
+    on_date_done is called once per processed date, with or without data.
+    """
+    dates = sorted(date_list, key=lambda d: d["date_str"])
+    pending: deque = deque()
+    next_index = 0
+    try:
+        while pending or next_index < len(dates):
+            while next_index < len(dates) and len(pending) < lookahead:
+                pending.append(asyncio.create_task(
+                    process_single_date(dates[next_index], workspace, store, clip_config, cog)
+                ))
+                next_index += 1
+            date_str, data = await pending.popleft()
+            if on_date_done is not None:
+                on_date_done()
+            if data is not None:
+                yield date_str, data
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+async def _prepend(items: Iterable[Tuple[str, bytes]],
+                   results: AsyncIterator[Tuple[str, bytes]]) -> AsyncIterator[Tuple[str, bytes]]:
+    """Yield already consumed items, then the rest of results."""
+    for item in items:
+        yield item
+    async for item in results:
+        yield item
+
+
+async def stream_zip(results: AsyncIterator[Tuple[str, bytes]]) -> AsyncIterator[bytes]:
+    """Write each GeoTIFF into a zip stream as soon as it is available."""
+    # Use no compression (ZIP_STORED) since GeoTIFFs are already compressed
+    zip_stream = zipstream.ZipFile(mode='w', compression=zipstream.ZIP_STORED)
+    async for date_str, data in results:
+        zip_stream.write_iter(f"{date_str}.tif", iter([data]))
+        for chunk in zip_stream.flush():
+            yield chunk
+    # Central directory
+    for chunk in zip_stream:
+        yield chunk
+
+
+def _write_zip_entry(archive: zipfile.ZipFile, arcname: str, data: bytes) -> None:
+    with archive.open(arcname, "w") as entry:
+        entry.write(data)
+
+
+async def write_export_zip(job: ExportJob, path: str, date_list: List[Dict],
+                           request: RasterExportRequest) -> None:
+    """Job runner: write every available date of the export into a zip file at path."""
+    def date_done():
+        job.completed_dates += 1
+
+    part_path = f"{path}.part"
+    # ZIP_STORED since GeoTIFFs are already compressed
+    archive = zipfile.ZipFile(part_path, "w", compression=zipfile.ZIP_STORED, allowZip64=True)
+    try:
+        try:
+            async for date_str, data in iter_date_results(date_list, request.workspace, request.store,
+                                                          request.clip, request.output_format == "cog",
+                                                          on_date_done=date_done):
+                await run_in_threadpool(_write_zip_entry, archive, f"{date_str}.tif", data)
+                job.files_written += 1
+        finally:
+            archive.close()
+    except BaseException:
+        with suppress(OSError):
+            os.remove(part_path)
+        raise
+
+    if not job.files_written:
+        os.remove(part_path)
+        raise ValueError("No data found for the given dates")
+    os.replace(part_path, path)
+
+
+async def write_export_netcdf(path: str, date_list: List[Dict], request: RasterExportRequest,
+                              on_date_done: Optional[Callable[[], None]] = None) -> int:
+    """
+    Write every available date of the export as one time slice of a NetCDF
+    cube at path, as each date arrives. Returns the number of slices written.
+    """
+    writer = await run_in_threadpool(NetCDFCubeWriter, path, data_variable_name(request.store))
+    try:
+        async for date_str, data in iter_date_results(date_list, request.workspace, request.store,
+                                                      request.clip, on_date_done=on_date_done):
+            await run_in_threadpool(writer.add, date_str, data)
+    finally:
+        await run_in_threadpool(writer.close)
+    return writer.slices
+
+
+async def write_export_netcdf_job(job: ExportJob, path: str, date_list: List[Dict],
+                                  request: RasterExportRequest) -> None:
+    """Job runner: write the export as a NetCDF cube at path."""
+    def date_done():
+        job.completed_dates += 1
+
+    part_path = f"{path}.part"
+    try:
+        job.files_written = await write_export_netcdf(part_path, date_list, request, date_done)
+    except BaseException:
+        with suppress(OSError):
+            os.remove(part_path)
+        raise
+    if not job.files_written:
+        os.remove(part_path)
+        raise ValueError("No data found for the given dates")
+    os.replace(part_path, path)
+
+
 # ---------- Endpoint ----------
 @router.post(
     "/raster-export",
@@ -80,14 +218,22 @@ def process_single_date(date_info: Dict, workspace: str, store: str,
             "content": {
                 "image/tiff": {
                     "schema": {"type": "string", "format": "binary"},
-                    "example": "single_tiff output returns a .tif file"
+                    "example": "single_tiff and cog outputs return a .tif file"
                 },
                 "application/zip": {
                     "schema": {"type": "string", "format": "binary"},
                     "example": "zip output returns a .zip file containing multiple .tif files"
+                },
+                "application/x-netcdf": {
+                    "schema": {"type": "string", "format": "binary"},
+                    "example": "netcdf output returns one .nc cube with a time dimension"
                 }
             }
         },
+        202: {
+            "description": "Export job queued (mode=job); poll /geoserver/raster-export/jobs/{job_id}",
+            "model": RasterExportJobStatus,
+        },
         400: {
             "description": "Bad request - too many dates requested or invalid parameters",
             "content": {
@@ -106,13 +252,25 @@ def process_single_date(date_info: Dict, workspace: str, store: str,
         }
     }
 )
-def export_rasters(request: RasterExportRequest):
+async def export_rasters(request: RasterExportRequest, current_user: dict = Depends(get_current_user)):
+    """
+    Export GeoServer rasters for a date range.
+
+    - **output_format=cog**: every file is a Cloud-Optimized GeoTIFF; a single
+      date is returned as one .tif, like single_tiff.
+    - **output_format=netcdf**: all dates are stacked into one compressed
+      NetCDF4 cube (time, lat, lon) of the first band.
+    - **mode=sync**: the file is returned in the response.
+    - **mode=job**: the export runs in the background and a job is returned
+      (202). Job mode allows larger date ranges and produces a zip
+      (or a .nc cube for netcdf).
+    """
     start = request.start_date
     end = request.end_date if request.end_date else start
     date_list = generate_date_list(start, end, request.temporality)
 
     # Validate date count against temporality-based limit
-    max_dates = get_max_dates_for_temporality(request.temporality)
+    max_dates = get_max_dates_for_temporality(request.temporality, request.mode)
     if len(date_list) > max_dates:
         raise HTTPException(
             status_code=400,
@@ -123,40 +281,99 @@ def export_rasters(request: RasterExportRequest):
     # Auth check (validates credentials are configured)
     get_geoserver_auth()
 
-    results = []
+    netcdf = request.output_format == "netcdf"
+    if request.mode == "job":
+        async def runner(job: ExportJob, path: str) -> None:
+            if netcdf:
+                await write_export_netcdf_job(job, path, date_list, request)
+            else:
+                await write_export_zip(job, path, date_list, request)
 
-    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
-        futures = {
-            executor.submit(
-                process_single_date,
-                d, request.workspace, request.store, request.clip
-            ): d for d in date_list
-        }
-        for future in as_completed(futures):
-            date_str, data = future.result()
-            if data is not None:
-                results.append((date_str, data))
+        extension, media_type = (".nc", NETCDF_MEDIA_TYPE) if netcdf else (".zip", "application/zip")
+        try:
+            job = export_jobs.submit(len(date_list), f"{request.store}_{start}_{end}{extension}",
+                                     runner, media_type, owner=current_user.get("sub"))
+        except ExportJobQueueFull:
+            raise HTTPException(status_code=503, detail="Too many export jobs queued, try again later")
+        return JSONResponse(status_code=202, content=job.to_dict())
 
-    if not results:
-        raise HTTPException(status_code=404, detail="No data found for the given dates")
+    if netcdf:
+        # NetCDF is not streamable; the cube is written to a temp file one slice at a time
+        fd, path = tempfile.mkstemp(suffix=".nc")
+        os.close(fd)
+        try:
+            slices = await write_export_netcdf(path, date_list, request)
+        except BaseException as e:
+            with suppress(OSError):
+                os.remove(path)
+            if isinstance(e, GeoServerUnavailable):
+                raise HTTPException(status_code=503, detail=str(e))
+            raise
+        if not slices:
+            os.remove(path)
+            raise HTTPException(status_code=404, detail="No data found for the given dates")
+        return FileResponse(path, media_type=NETCDF_MEDIA_TYPE,
+                            filename=f"{request.store}_{start}_{end}.nc",
+                            background=BackgroundTask(os.remove, path))
 
-    # Sort results chronologically by date string
-    results.sort(key=lambda x: x[0])
+    # Downloads run ahead of the response with bounded lookahead
+    results = iter_date_results(date_list, request.workspace, request.store, request.clip,
+                                request.output_format == "cog")
 
-    if len(results) == 1 and request.output_format == "single_tiff":
-        date_str, data = results[0]
-        return StreamingResponse(
-            iter([data]),
-            media_type="image/tiff",
-            headers={"Content-Disposition": f'attachment; filename="{date_str}.tif"'},
-        )
+    # Wait for the first date with data so a missing range still returns 404
+    # (and an unavailable GeoServer a 503, before the response has started)
+    try:
+        first = await anext(results, None)
+        if first is None:
+            raise HTTPException(status_code=404, detail="No data found for the given dates")
+        second = await anext(results, None) if request.output_format in ("single_tiff", "cog") else None
+    except GeoServerUnavailable as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+    if request.output_format in ("single_tiff", "cog"):
+        if second is None:
+            date_str, data = first
+            return StreamingResponse(
+                iter([data]),
+                media_type="image/tiff",
+                headers={"Content-Disposition": f'attachment; filename="{date_str}.tif"'},
+            )
+        consumed = [first, second]
     else:
-        # Use no compression (ZIP_STORED) since GeoTIFFs are already compressed
-        zip_stream = zipstream.ZipFile(mode='w', compression=zipstream.ZIP_STORED)
-        for date_str, data in results:
-            zip_stream.writestr(f"{date_str}.tif", data)
-        return StreamingResponse(
-            zip_stream,
-            media_type="application/zip",
-            headers={"Content-Disposition": "attachment; filename=rasters.zip"},
-        )
\ No newline at end of file
+        consumed = [first]
+
+    return StreamingResponse(
+        stream_zip(_prepend(consumed, results)),
+        media_type="application/zip",
+        headers={"Content-Disposition": "attachment; filename=rasters.zip"},
+    )
+
+
+@router.get("/raster-export/jobs/{job_id}", response_model=RasterExportJobStatus)
+async def get_export_job(job_id: str, current_user: dict = Depends(get_current_user)):
+    """Return the status and progress of a raster export job started by the caller."""
+    job = export_jobs.get(job_id, owner=current_user.get("sub"))
+    if job is None:
+        raise HTTPException(status_code=404, detail="Export job not found")
+    return job.to_dict()
+
+
+@router.get(
+    "/raster-export/jobs/{job_id}/download",
+    response_class=FileResponse,
+    responses={
+        200: {"content": {
+            "application/zip": {"schema": {"type": "string", "format": "binary"}},
+            "application/x-netcdf": {"schema": {"type": "string", "format": "binary"}},
+        }},
+        409: {"description": "The job has not completed"},
+    },
+)
+async def download_export_job(job_id: str, current_user: dict = Depends(get_current_user)):
+    """Download the zip produced by a completed raster export job started by the caller."""
+    job = export_jobs.get(job_id, owner=current_user.get("sub"))
+    if job is None:
+        raise HTTPException(status_code=404, detail="Export job not found")
+    if job.status != JOB_COMPLETED:
+        raise HTTPException(status_code=409, detail=f"Export job is {job.status}")
+    return FileResponse(job.path, media_type=job.media_type, filename=job.filename)
@@ -0,0 +1,22 @@
+from fastapi import APIRouter
+
+from schemas.geoserver import GeoServerPoolStats
+from services.geoserver import get_session_pool_stats
+from services.geoserver_client import get_async_pool_stats, get_governor_stats
+
+router = APIRouter(tags=["Geoserver"], prefix="/geoserver")
+
+
+@router.get("/stats", response_model=GeoServerPoolStats)
+def get_geoserver_stats():
+    """
+    Returns GeoServer connection pool and concurrency governor metrics for this process.
+
+    - **hits**: requests served on an already open keep-alive connection
+    - **misses**: requests that had to open a new connection
+    """
+    return GeoServerPoolStats(
+        sync_session=get_session_pool_stats(),
+        async_client=get_async_pool_stats(),
+        governor=get_governor_stats(),
+    )
@@ -2,6 +2,10 @@ from schemas.location import Country, Admin1, Admin2, Location, MeasureData, Lat
 from schemas.climate import (
     ClimateHistoricalMonthRecord,
     ClimateHistoricalDateRecord,
+    HistoricalColumnarLocation,
+    HistoricalColumnarMeasure,
+    ClimateHistoricalDateColumns,
+    ClimateHistoricalMonthColumns,
     ClimateHistoricalIndicatorRecord,
     MinMaxMonthRecord,
     MinMaxDateRecord,
@@ -9,7 +13,9 @@ from schemas.climate import (
 from schemas.mng import CountryIndicator, IndicatorCategory, IndicatorFeature, Indicator, IndicatorWithFeatures
 from schemas.geoserver import (
     Coordinate, PointDataRequest, PointDataResult, PointDataResponse,
-    ClipGeoserverSource, ClipConfig, RasterExportRequest,
+    PointTimeSeries, PointTimeSeriesResponse,
+    ClipGeoserverSource, ClipConfig, RasterExportRequest, RasterExportJobStatus,
+    PoolStats, GovernorStats, GeoServerPoolStats,
 )
 from schemas.auth import (
     Credential,
@@ -27,6 +33,8 @@ __all__ = [
     "MeasureData", "LatestData", "LocationWithData",
     # climate
     "ClimateHistoricalMonthRecord", "ClimateHistoricalDateRecord",
+    "HistoricalColumnarLocation", "HistoricalColumnarMeasure",
+    "ClimateHistoricalDateColumns", "ClimateHistoricalMonthColumns",
     "ClimateHistoricalIndicatorRecord",
     "MinMaxMonthRecord", "MinMaxDateRecord",
     # mng
@@ -34,8 +42,10 @@ __all__ = [
     "Indicator", "IndicatorWithFeatures",
     # geoserver
     "Coordinate", "PointDataRequest", "PointDataResult",
-    "PointDataResponse", "ClipGeoserverSource", "ClipConfig",
-    "RasterExportRequest",
+    "PointDataResponse", "PointTimeSeries", "PointTimeSeriesResponse",
+    "ClipGeoserverSource", "ClipConfig",
+    "RasterExportRequest", "RasterExportJobStatus", "PoolStats", "GovernorStats",
+    "GeoServerPoolStats",
     # auth
     "Credential", "UserCreateRequest", "CreateRoleRequest",
     "DeleteUserRequest", "SafeUserUpdate",
@@ -1,4 +1,4 @@
-from typing import Optional
+from typing import List, Optional
 from pydantic import BaseModel
 from datetime import date, datetime
 
@@ -59,6 +59,63 @@ class ClimateHistoricalDateRecord(BaseModel):
         }
 
 
+class HistoricalColumnarLocation(BaseModel):
+    id: int
+    name: Optional[str] = None
+
+
+class HistoricalColumnarMeasure(BaseModel):
+    id: Optional[int] = None
+    name: Optional[str] = None
+    short_name: Optional[str] = None
+    unit: Optional[str] = None
+
+
+class ClimateHistoricalDateColumns(BaseModel):
+    locations: List[HistoricalColumnarLocation]
+    measures: List[HistoricalColumnarMeasure]
+    location_index: List[int]
+    measure_index: List[int]
+    dates: List[date]
+    values: List[float]
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "locations": [{"id": 103, "name": "LACHORRERA"}],
+                "measures": [
+                    {"id": 7, "name": "Minimum temperature", "short_name": "tmin", "unit": "°C"},
+                    {"id": 8, "name": "Maximum temperature", "short_name": "tmax", "unit": "°C"}
+                ],
+                "location_index": [0, 0, 0],
+                "measure_index": [0, 1, 0],
+                "dates": ["1996-11-01", "1996-11-01", "1996-11-02"],
+                "values": [23.0, 31.5, 22.4]
+            }
+        }
+
+
+class ClimateHistoricalMonthColumns(BaseModel):
+    locations: List[HistoricalColumnarLocation]
+    measures: List[HistoricalColumnarMeasure]
+    location_index: List[int]
+    measure_index: List[int]
+    months: List[int]
+    values: List[float]
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "locations": [{"id": 114, "name": "SOPROCOM LA CONCORDIA"}],
+                "measures": [{"id": 4, "name": "Humedad relativa calculada máxima diaria", "short_name": "hrmax", "unit": "% (porcentaje)"}],
+                "location_index": [0, 0],
+                "measure_index": [0, 0],
+                "months": [1, 2],
+                "values": [90.16, 89.7]
+            }
+        }
+
+
 class ClimateHistoricalIndicatorRecord(BaseModel):
     id: int
     indicator_id: int
@@ -81,6 +81,29 @@ class PointDataResponse(BaseModel):
         }
 
 
+class PointTimeSeries(BaseModel):
+    coordinate: List[float]
+    values: List[Optional[float]]
+
+
+class PointTimeSeriesResponse(BaseModel):
+    dates: List[str]
+    series: List[PointTimeSeries]
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "dates": ["2024-01-01", "2024-01-02", "2024-01-03"],
+                "series": [
+                    {
+                        "coordinate": [-74.0817, 4.6097],
+                        "values": [12.5, 0.0, None]
+                    }
+                ]
+            }
+        }
+
+
 class ClipGeoserverSource(BaseModel):
     workspace: str
     layer: str
@@ -120,7 +143,8 @@ class RasterExportRequest(BaseModel):
     end_date: Optional[date] = None
     temporality: Literal["daily", "monthly", "annual"] = "daily"
     clip: ClipConfig = ClipConfig()
-    output_format: Literal["single_tiff", "zip"] = "zip"
+    output_format: Literal["single_tiff", "zip", "cog", "netcdf"] = "zip"
+    mode: Literal["sync", "job"] = "sync"
 
     @field_validator('end_date')
     @classmethod
@@ -144,6 +168,61 @@ class RasterExportRequest(BaseModel):
                     "enabled": False,
                     "geoserver": None
                 },
-                "output_format": "zip"
+                "output_format": "zip",
+                "mode": "sync"
+            }
+        }
+
+
+class RasterExportJobStatus(BaseModel):
+    job_id: str
+    status: Literal["queued", "running", "completed", "failed"]
+    total_dates: int
+    completed_dates: int
+    files_written: int
+    progress: float
+    error: Optional[str] = None
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "job_id": "3f2b8c0e5d9a4a7f9b1c2d3e4f5a6b7c",
+                "status": "running",
+                "total_dates": 366,
+                "completed_dates": 120,
+                "files_written": 120,
+                "progress": 0.3279,
+                "error": None
+            }
+        }
+
+
+class PoolStats(BaseModel):
+    requests: int
+    hits: int
+    misses: int
+
+
+class GovernorStats(BaseModel):
+    limit: int
+    in_flight: int
+    latency: Optional[float] = None
+    requests: int
+    overloads: int
+    breaker: Literal["closed", "open", "half_open"]
+
+
+class GeoServerPoolStats(BaseModel):
+    sync_session: PoolStats
+    async_client: PoolStats
+    governor: Optional[GovernorStats] = None
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "sync_session": {"requests": 120, "hits": 116, "misses": 4},
+                "async_client": {"requests": 365, "hits": 357, "misses": 8},
+                "governor": {"limit": 12, "in_flight": 3, "latency": 0.84,
+                             "requests": 365, "overloads": 0, "breaker": "closed"}
             }
         }
@@ -0,0 +1,271 @@
+"""
+Shared climate historical query module.
+
+Centralizes:
+- Range-bounded queries over the historical climate tables
+- Location and measure name joins (one round trip per request)
+- Session handling for direct database access
+- Compact columnar encoding of query results
+- Chunked NDJSON / CSV streaming through a server-side cursor
+"""
+
+import csv
+import io
+import json
+import logging
+import os
+from datetime import date
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from fastapi.responses import StreamingResponse
+from sqlalchemy import Row, Select, case, or_, select
+from aclimate_v3_orm.database import SessionLocal
+from aclimate_v3_orm.models.climate_historical_climatology import ClimateHistoricalClimatology
+from aclimate_v3_orm.models.climate_historical_daily import ClimateHistoricalDaily
+from aclimate_v3_orm.models.climate_historical_monthly import ClimateHistoricalMonthly
+from aclimate_v3_orm.models.mng_location import MngLocation
+from aclimate_v3_orm.models.mng_climate_measure import MngClimateMeasure
+
+# ---------- Logger ----------
+logger = logging.getLogger(__name__)
+
+# ---------- Configuration from environment ----------
+STREAM_CHUNK_SIZE = int(os.getenv("HISTORICAL_STREAM_CHUNK_SIZE", "5000"))
+
+# ---------- Constants ----------
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+CSV_MEDIA_TYPE = "text/csv"
+
+RECORD_FIELDS = (
+    "id", "location_id", "location_name",
+    "measure_id", "measure_name", "measure_short_name", "measure_unit",
+)
+
+
+# ---------- Query building ----------
+def _select_with_names(model, time_column) -> Select:
+    """
+    Select the flat record columns of a historical table, already joined
+    to the location and measure names.
+    """
+    return (
+        select(
+            model.id,
+            model.location_id,
+            MngLocation.name.label("location_name"),
+            model.measure_id,
+            MngClimateMeasure.name.label("measure_name"),
+            MngClimateMeasure.short_name.label("measure_short_name"),
+            MngClimateMeasure.unit.label("measure_unit"),
+            time_column,
+            model.value,
+        )
+        .outerjoin(MngLocation, MngLocation.id == model.location_id)
+        .outerjoin(MngClimateMeasure, MngClimateMeasure.id == model.measure_id)
+    )
+
+
+def build_date_range_query(model, location_ids: List[int], start_date: date, end_date: date) -> Select:
+    """
+    Build a query for all measures of the given locations between
+    start_date and end_date (inclusive), ordered by location and date.
+    """
+    return (
+        _select_with_names(model, model.date)
+        .where(model.location_id.in_(location_ids))
+        .where(model.date.between(start_date, end_date))
+        .order_by(model.location_id, model.date, model.measure_id)
+    )
+
+
+def build_daily_date_range_query(location_ids: List[int], start_date: date, end_date: date) -> Select:
+    """Build a date range query over the daily historical table."""
+    return build_date_range_query(ClimateHistoricalDaily, location_ids, start_date, end_date)
+
+
+def build_monthly_date_range_query(location_ids: List[int], start_date: date, end_date: date) -> Select:
+    """Build a date range query over the monthly historical table."""
+    return build_date_range_query(ClimateHistoricalMonthly, location_ids, start_date, end_date)
+
+
+def build_climatology_month_range_query(location_ids: List[int], start_month: int, end_month: int) -> Select:
+    """
+    Build a month range query over the climatology table.
+
+    When start_month > end_month the range wraps around the year end
+    (e.g. 11..2 selects Nov, Dec, Jan, Feb), and rows are ordered by
+    position within the season rather than by calendar month.
+    """
+    model = ClimateHistoricalClimatology
+    if start_month <= end_month:
+        month_filter = model.month.between(start_month, end_month)
+    else:
+        month_filter = or_(model.month >= start_month, model.month <= end_month)
+
+    season_order = case(
+        (model.month >= start_month, model.month - start_month),
+        else_=model.month + 12 - start_month,
+    )
+    return (
+        _select_with_names(model, model.month)
+        .where(model.location_id.in_(location_ids))
+        .where(month_filter)
+        .order_by(model.location_id, season_order, model.measure_id)
+    )
+
+
+# ---------- Execution ----------
+def fetch_rows(stmt: Select) -> List[Row]:
+    """Execute a query in a short-lived session and return all rows."""
+    db = SessionLocal()
+    try:
+        return db.execute(stmt).all()
+    finally:
+        db.close()
+
+
+def get_daily_by_date_range(location_ids: List[int], start_date: date, end_date: date) -> List[Row]:
+    """Return daily rows for the given locations within the date range."""
+    rows = fetch_rows(build_daily_date_range_query(location_ids, start_date, end_date))
+    logger.info("Fetched %d daily rows for %d locations", len(rows), len(location_ids))
+    return rows
+
+
+def get_monthly_by_date_range(location_ids: List[int], start_date: date, end_date: date) -> List[Row]:
+    """Return monthly rows for the given locations within the date range."""
+    rows = fetch_rows(build_monthly_date_range_query(location_ids, start_date, end_date))
+    logger.info("Fetched %d monthly rows for %d locations", len(rows), len(location_ids))
+    return rows
+
+
+def get_climatology_by_month_range(location_ids: List[int], start_month: int, end_month: int) -> List[Row]:
+    """Return climatology rows for the given locations within the (possibly wrapping) month range."""
+    rows = fetch_rows(build_climatology_month_range_query(location_ids, start_month, end_month))
+    logger.info("Fetched %d climatology rows for %d locations", len(rows), len(location_ids))
+    return rows
+
+
+# ---------- Columnar encoding ----------
+def to_columnar(rows: Iterable[Row], time_field: str = "date") -> Dict[str, Any]:
+    """
+    Encode flat historical rows as parallel arrays.
+
+    Locations and measures are listed once and referenced by position from
+    location_index / measure_index. time_field is "date" (daily/monthly
+    tables, emitted as "dates") or "month" (climatology, emitted as "months").
+    The result is JSON-ready and matches ClimateHistoricalDateColumns /
+    ClimateHistoricalMonthColumns.
+    """
+    location_positions: Dict[int, int] = {}
+    measure_positions: Dict[Any, int] = {}
+    locations: List[Dict[str, Any]] = []
+    measures: List[Dict[str, Any]] = []
+    location_index: List[int] = []
+    measure_index: List[int] = []
+    times: List[Any] = []
+    values: List[float] = []
+
+    for row in rows:
+        loc_pos = location_positions.get(row.location_id)
+        if loc_pos is None:
+            loc_pos = location_positions[row.location_id] = len(locations)
+            locations.append({"id": row.location_id, "name": row.location_name})
+
+        measure_pos = measure_positions.get(row.measure_id)
+        if measure_pos is None:
+            measure_pos = measure_positions[row.measure_id] = len(measures)
+            measures.append({
+                "id": row.measure_id,
+                "name": row.measure_name,
+                "short_name": row.measure_short_name,
+                "unit": row.measure_unit,
+            })
+
+        location_index.append(loc_pos)
+        measure_index.append(measure_pos)
+        value = getattr(row, time_field)
+        times.append(value.isoformat() if time_field == "date" else value)
+        values.append(float(row.value))
+
+    return {
+        "locations": locations,
+        "measures": measures,
+        "location_index": location_index,
+        "measure_index": measure_index,
+        "dates" if time_field == "date" else "months": times,
+        "values": values,
+    }
+
+
+# ---------- Streaming ----------
+def stream_rows(stmt: Select, chunk_size: int = STREAM_CHUNK_SIZE) -> Iterator[List[Row]]:
+    """
+    Yield rows in chunks of chunk_size as the database produces them.
+
+    Uses a server-side cursor, so only one chunk is held in memory at a time.
+    The session stays open until the generator is exhausted or closed.
+    """
+    db = SessionLocal()
+    try:
+        result = db.execute(stmt.execution_options(stream_results=True, yield_per=chunk_size))
+        for partition in result.partitions():
+            yield partition
+    finally:
+        db.close()
+
+
+def get_stream_media_type(accept: Optional[str]) -> Optional[str]:
+    """Return the streaming media type requested in an Accept header, if any."""
+    if not accept:
+        return None
+    for media_type in (NDJSON_MEDIA_TYPE, CSV_MEDIA_TYPE):
+        if media_type in accept:
+            return media_type
+    return None
+
+
+def _record_dict(row: Row, time_field: str) -> Dict[str, Any]:
+    record = {field: getattr(row, field) for field in RECORD_FIELDS}
+    value = getattr(row, time_field)
+    record[time_field] = value.isoformat() if time_field == "date" else value
+    record["value"] = row.value
+    return record
+
+
+def iter_ndjson(chunks: Iterable[List[Row]], time_field: str = "date") -> Iterator[str]:
+    """Encode row chunks as newline-delimited JSON, one chunk per yielded string."""
+    for chunk in chunks:
+        yield "".join(
+            json.dumps(_record_dict(row, time_field), ensure_ascii=False) + "\n"
+            for row in chunk
+        )
+
+
+def iter_csv(chunks: Iterable[List[Row]], time_field: str = "date") -> Iterator[str]:
+    """Encode row chunks as CSV with a header line, one chunk per yielded string."""
+    header = RECORD_FIELDS + (time_field, "value")
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(header)
+    for chunk in chunks:
+        for row in chunk:
+            record = _record_dict(row, time_field)
+            writer.writerow([record[field] for field in header])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def streaming_response(stmt: Select, media_type: str, filename: str,
+                       time_field: str = "date") -> StreamingResponse:
+    """Build a StreamingResponse that encodes the query results as NDJSON or CSV."""
+    chunks = stream_rows(stmt)
+    if media_type == CSV_MEDIA_TYPE:
+        return StreamingResponse(
+            iter_csv(chunks, time_field),
+            media_type=CSV_MEDIA_TYPE,
+            headers={"Content-Disposition": f'attachment; filename="{filename}.csv"'},
+        )
+    return StreamingResponse(iter_ndjson(chunks, time_field), media_type=NDJSON_MEDIA_TYPE)
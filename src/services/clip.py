@@ -0,0 +1,285 @@
+"""
+Shared raster clipping module.
+
+Centralizes:
+- WFS boundary geometry fetches through the shared GeoServer session
+- Bounded TTL cache of clip geometries keyed by (workspace, layer, cql_filter)
+- LRU cache of rasterized clip masks, one per raster grid
+- Windowed crop of in-memory GeoTIFFs to a clip mask
+"""
+
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, NamedTuple, Optional, Tuple
+from urllib.parse import urlencode
+
+import numpy as np
+from affine import Affine
+from rasterio.crs import CRS
+from rasterio.features import geometry_mask
+from rasterio.io import MemoryFile
+from rasterio.warp import transform_geom
+from rasterio.windows import Window
+
+from services.geoserver import DEFAULT_TIMEOUT, get_geoserver_session, get_geoserver_url
+from services.raster import NODATA_SENTINEL
+
+# ---------- Logger ----------
+logger = logging.getLogger(__name__)
+
+# ---------- Configuration from environment ----------
+# How long fetched boundary geometries are reused
+CLIP_GEOMETRY_TTL_SECONDS = int(os.getenv("CLIP_GEOMETRY_TTL_SECONDS", "3600"))
+# Number of boundary geometry sets kept in memory
+CLIP_GEOMETRY_CACHE_SIZE = int(os.getenv("CLIP_GEOMETRY_CACHE_SIZE", "64"))
+# Number of rasterized masks kept in memory
+CLIP_MASK_CACHE_SIZE = int(os.getenv("CLIP_MASK_CACHE_SIZE", "32"))
+
+# ---------- Constants ----------
+# WFS 1.0.0 keeps lon/lat axis order for EPSG:4326
+GEOMETRY_CRS = "EPSG:4326"
+
+# Creation options of clipped GeoTIFFs
+GTIFF_PROFILE = {
+    "driver": "GTiff",
+    "compress": "deflate",
+    "tiled": True,
+    "blockxsize": 256,
+    "blockysize": 256,
+}
+
+GeometryKey = Tuple[str, str, Optional[str]]
+
+
+class ClipGeometries(NamedTuple):
+    """GeoJSON geometries of a boundary layer, in GEOMETRY_CRS."""
+    geometries: List[Dict[str, Any]]
+    fetched_at: float
+
+
+class ClipMask(NamedTuple):
+    """Boolean mask (True inside the geometries) and the window enclosing it."""
+    mask: np.ndarray
+    rows: slice
+    cols: slice
+
+
+# ---------- Geometry fetch ----------
+def build_wfs_url(workspace: str, layer: str, cql_filter: Optional[str] = None) -> str:
+    """Build a WFS GetFeature URL returning the layer's features as GeoJSON."""
+    params = [
+        ("service", "WFS"),
+        ("version", "1.0.0"),
+        ("request", "GetFeature"),
+        ("typeName", f"{workspace}:{layer}"),
+        ("outputFormat", "application/json"),
+        ("srsName", GEOMETRY_CRS),
+    ]
+    if cql_filter:
+        params.append(("CQL_FILTER", cql_filter))
+    return f"{get_geoserver_url()}{workspace}/ows?" + urlencode(params)
+
+
+def fetch_clip_geometries(workspace: str, layer: str, cql_filter: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Fetch the geometries of a boundary layer from GeoServer. Raises ValueError if none match."""
+    url = build_wfs_url(workspace, layer, cql_filter)
+    resp = get_geoserver_session().get(url, timeout=DEFAULT_TIMEOUT)
+    resp.raise_for_status()
+    geometries = [f["geometry"] for f in resp.json().get("features", []) if f.get("geometry")]
+    if not geometries:
+        raise ValueError(f"No clip geometries found in {workspace}:{layer} for filter {cql_filter!r}")
+    logger.info("Fetched %d clip geometries from %s:%s", len(geometries), workspace, layer)
+    return geometries
+
+
+class ClipGeometryCache:
+    """
+    Thread-safe TTL cache of boundary geometries, bounded by entry count
+    (least recently used first out). Concurrent misses for the same key
+    wait for a single fetch.
+    """
+
+    def __init__(self, ttl_seconds: int, max_entries: int = CLIP_GEOMETRY_CACHE_SIZE):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[GeometryKey, ClipGeometries]" = OrderedDict()
+        self._key_locks: Dict[GeometryKey, threading.Lock] = {}
+
+    def _fresh(self, key: GeometryKey) -> Optional[ClipGeometries]:
+        """Return the unexpired entry of key, dropping it if expired. Call with _lock held."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if time.monotonic() - entry.fetched_at >= self.ttl_seconds:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def _put(self, key: GeometryKey, entry: ClipGeometries) -> None:
+        """Store an entry, evicting expired and then least recently used ones. Call with _lock held."""
+        if self.max_entries <= 0:
+            return
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        cutoff = time.monotonic() - self.ttl_seconds
+        for old_key in [k for k, e in self._entries.items() if e.fetched_at <= cutoff]:
+            del self._entries[old_key]
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def get(self, workspace: str, layer: str, cql_filter: Optional[str] = None) -> ClipGeometries:
+        key = (workspace, layer, cql_filter)
+        with self._lock:
+            entry = self._fresh(key)
+            if entry is not None:
+                return entry
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+
+        with key_lock:
+            with self._lock:
+                entry = self._fresh(key)
+            if entry is not None:
+                return entry
+            try:
+                entry = ClipGeometries(fetch_clip_geometries(workspace, layer, cql_filter), time.monotonic())
+                with self._lock:
+                    self._put(key, entry)
+                return entry
+            finally:
+                # Later misses create a new lock; current waiters still share this one
+                with self._lock:
+                    if self._key_locks.get(key) is key_lock:
+                        del self._key_locks[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+geometry_cache = ClipGeometryCache(CLIP_GEOMETRY_TTL_SECONDS)
+
+
+# ---------- Mask rasterization ----------
+def rasterize_clip_mask(geometries: List[Dict[str, Any]], transform: Affine,
+                        shape: Tuple[int, int], crs: Optional[CRS]) -> ClipMask:
+    """
+    Rasterize geometries (in GEOMETRY_CRS) onto a raster grid.
+    Raises ValueError if they do not cover any pixel.
+    """
+    if crs is not None and CRS.from_user_input(crs) != CRS.from_user_input(GEOMETRY_CRS):
+        geometries = [transform_geom(GEOMETRY_CRS, crs, geom) for geom in geometries]
+    mask = geometry_mask(geometries, out_shape=shape, transform=transform, invert=True)
+
+    rows = np.flatnonzero(mask.any(axis=1))
+    cols = np.flatnonzero(mask.any(axis=0))
+    if not len(rows):
+        raise ValueError("Clip geometries do not intersect the raster")
+    mask.setflags(write=False)
+    return ClipMask(mask, slice(rows[0], rows[-1] + 1), slice(cols[0], cols[-1] + 1))
+
+
+class ClipMaskCache:
+    """Thread-safe LRU cache of rasterized clip masks, bounded by entry count."""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Hashable, ClipMask]" = OrderedDict()
+
+    def get(self, key: Hashable) -> Optional[ClipMask]:
+        with self._lock:
+            mask = self._entries.get(key)
+            if mask is not None:
+                self._entries.move_to_end(key)
+            return mask
+
+    def put(self, key: Hashable, mask: ClipMask) -> None:
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = mask
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+mask_cache = ClipMaskCache(CLIP_MASK_CACHE_SIZE)
+
+
+def get_clip_mask(workspace: str, layer: str, cql_filter: Optional[str],
+                  transform: Affine, shape: Tuple[int, int], crs: Optional[CRS]) -> ClipMask:
+    """
+    Return the clip mask of a boundary layer for a raster grid.
+
+    Geometries are fetched at most once per CLIP_GEOMETRY_TTL_SECONDS and
+    each grid (transform, shape, crs) is rasterized once, so every date of
+    an export reuses the same mask.
+    """
+    clip_geometries = geometry_cache.get(workspace, layer, cql_filter)
+    key = (workspace, layer, cql_filter, clip_geometries.fetched_at,
+           tuple(transform), tuple(shape), crs.to_string() if crs else None)
+    mask = mask_cache.get(key)
+    if mask is None:
+        mask = rasterize_clip_mask(clip_geometries.geometries, transform, shape, crs)
+        mask_cache.put(key, mask)
+    return mask
+
+
+# ---------- Clipping ----------
+def default_nodata(dtype: np.dtype) -> float:
+    """
+    Nodata value for a raster without one: NaN for floats, NODATA_SENTINEL
+    when the integer dtype can hold it, else the dtype's maximum
+    (e.g. 255 for uint8).
+    """
+    if np.issubdtype(dtype, np.floating):
+        return np.nan
+    info = np.iinfo(dtype)
+    return NODATA_SENTINEL if info.min <= NODATA_SENTINEL <= info.max else info.max
+
+
+def clip_geotiff(raster_bytes: bytes, workspace: str, layer: str,
+                 cql_filter: Optional[str] = None) -> bytes:
+    """
+    Clip an in-memory GeoTIFF to a boundary layer and return a new GeoTIFF.
+
+    Only the pixel window enclosing the clip mask is read from the source.
+    Pixels outside the geometries are set to nodata in place, and the output
+    is written as a tiled, DEFLATE-compressed GeoTIFF.
+    """
+    with MemoryFile(raster_bytes) as memfile:
+        with memfile.open() as src:
+            crs = src.crs or CRS.from_user_input(GEOMETRY_CRS)
+            clip_mask = get_clip_mask(workspace, layer, cql_filter, src.transform, src.shape, crs)
+            window = Window.from_slices(clip_mask.rows, clip_mask.cols)
+            data = src.read(window=window)
+            transform = src.window_transform(window)
+            profile = src.profile
+
+    nodata = profile.get("nodata")
+    if nodata is None:
+        nodata = default_nodata(data.dtype)
+    data[:, ~clip_mask.mask[clip_mask.rows, clip_mask.cols]] = nodata
+
+    profile.update(GTIFF_PROFILE)
+    profile.update(
+        height=data.shape[1],
+        width=data.shape[2],
+        transform=transform,
+        crs=crs,
+        nodata=nodata,
+        predictor=3 if np.issubdtype(data.dtype, np.floating) else 2,
+    )
+    with MemoryFile() as mem_out:
+        with mem_out.open(**profile) as dst:
+            dst.write(data)
+        return mem_out.read()
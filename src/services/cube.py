@@ -0,0 +1,138 @@
+"""
+Multi-date raster cube export.
+
+Centralizes:
+- Incremental NetCDF4 writing, one time slice per date
+- CF-style time, coordinate and grid mapping variables
+- Chunked, compressed data variables, named apart from the coordinates
+"""
+
+import logging
+import os
+import re
+import threading
+from datetime import date
+from typing import Optional
+
+import netCDF4
+import numpy as np
+from rasterio.io import MemoryFile
+
+# ---------- Logger ----------
+logger = logging.getLogger(__name__)
+
+# ---------- Configuration from environment ----------
+# zlib level of the cube's data variable (1-9)
+NETCDF_COMPLEVEL = int(os.getenv("NETCDF_COMPLEVEL", "4"))
+
+# ---------- Constants ----------
+NETCDF_MEDIA_TYPE = "application/x-netcdf"
+TIME_UNITS = "days since 1970-01-01"
+CHUNK_SIZE = 256  # pixels per chunk side
+# Names taken by the cube's dimensions, coordinates and grid mapping
+RESERVED_NAMES = {"time", "lat", "lon", "y", "x", "spatial_ref"}
+
+# The netCDF/HDF5 C libraries are not thread-safe; serialize every call into them
+_netcdf_lock = threading.Lock()
+
+
+def data_variable_name(store: str) -> str:
+    """
+    NetCDF name of a store's data variable: non-word characters become "_",
+    and names taken by the cube's coordinates get a "_data" suffix.
+    """
+    name = re.sub(r"\W", "_", store)
+    return f"{name}_data" if name in RESERVED_NAMES else name
+
+
+class NetCDFCubeWriter:
+    """
+    Write GeoTIFFs of the same grid as consecutive time slices of one
+    NetCDF4 variable. The grid is taken from the first slice, and only one
+    slice is held in memory at a time.
+    """
+
+    def __init__(self, path: str, variable: str, complevel: int = NETCDF_COMPLEVEL):
+        self.path = path
+        self.variable = variable
+        self.complevel = complevel
+        self.slices = 0
+        with _netcdf_lock:
+            self._dataset = netCDF4.Dataset(path, "w", format="NETCDF4")
+        self._shape: Optional[tuple] = None
+        self._transform = None
+
+    def _create_variables(self, raster) -> None:
+        height, width = raster.height, raster.width
+        transform = raster.transform
+        geographic = raster.crs is None or raster.crs.is_geographic
+        y_name, x_name = ("lat", "lon") if geographic else ("y", "x")
+
+        ds = self._dataset
+        ds.Conventions = "CF-1.8"
+        ds.createDimension("time", None)
+        ds.createDimension(y_name, height)
+        ds.createDimension(x_name, width)
+
+        time_var = ds.createVariable("time", "f8", ("time",))
+        time_var.units = TIME_UNITS
+        time_var.calendar = "standard"
+        time_var.standard_name = "time"
+
+        # Pixel centre coordinates
+        y_var = ds.createVariable(y_name, "f8", (y_name,))
+        y_var[:] = transform.f + transform.e * (np.arange(height) + 0.5)
+        x_var = ds.createVariable(x_name, "f8", (x_name,))
+        x_var[:] = transform.c + transform.a * (np.arange(width) + 0.5)
+        if geographic:
+            y_var.standard_name, y_var.units = "latitude", "degrees_north"
+            x_var.standard_name, x_var.units = "longitude", "degrees_east"
+        else:
+            y_var.standard_name, x_var.standard_name = "projection_y_coordinate", "projection_x_coordinate"
+
+        crs_var = ds.createVariable("spatial_ref", "i4")
+        crs_wkt = raster.crs.to_wkt() if raster.crs is not None else 'GEOGCS["WGS 84"]'
+        crs_var.crs_wkt = crs_var.spatial_ref = crs_wkt
+        crs_var.GeoTransform = " ".join(str(v) for v in transform.to_gdal())
+
+        dtype = np.dtype(raster.dtypes[0])
+        nodata = raster.nodata
+        if nodata is None and np.issubdtype(dtype, np.floating):
+            nodata = np.nan
+        data_var = ds.createVariable(
+            self.variable, dtype, ("time", y_name, x_name),
+            zlib=True, complevel=self.complevel, shuffle=True,
+            chunksizes=(1, min(CHUNK_SIZE, height), min(CHUNK_SIZE, width)),
+            fill_value=nodata,
+        )
+        data_var.grid_mapping = "spatial_ref"
+
+        self._shape = (height, width)
+        self._transform = transform
+
+    def add(self, date_str: str, raster_bytes: bytes) -> bool:
+        """
+        Append the first band of a GeoTIFF as the slice for date_str.
+        Returns False (and skips it) if its grid differs from the first slice.
+        """
+        with MemoryFile(raster_bytes) as memfile:
+            with memfile.open() as raster:
+                if self._shape is None:
+                    with _netcdf_lock:
+                        self._create_variables(raster)
+                elif (raster.height, raster.width) != self._shape or raster.transform != self._transform:
+                    logger.warning("Skipping %s in cube %s: grid differs from the first date",
+                                   date_str, self.path)
+                    return False
+                band = raster.read(1)
+
+        index = self.slices
+        with _netcdf_lock:
+            self._dataset["time"][index] = (date.fromisoformat(date_str) - date(1970, 1, 1)).days
+            self._dataset[self.variable][index, :, :] = band
+        self.slices += 1
+        return True
+
+    def close(self) -> None:
+        with _netcdf_lock:
+            self._dataset.close()
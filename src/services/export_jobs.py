@@ -0,0 +1,227 @@
+"""
+Background raster export jobs.
+
+Centralizes:
+- In-process registry of export jobs with status and progress
+- Bounded queue consumed by a fixed pool of asyncio workers
+- Job output files on local disk and their periodic expiry, including
+  files left behind by a previous process
+- Job ownership, so only the requester can read a job
+"""
+
+import asyncio
+import logging
+import os
+import tempfile
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+# ---------- Logger ----------
+logger = logging.getLogger(__name__)
+
+# ---------- Configuration from environment ----------
+EXPORT_JOBS_DIR = os.getenv(
+    "EXPORT_JOBS_DIR", os.path.join(tempfile.gettempdir(), "aclimate_export_jobs")
+)
+# Number of jobs processed at the same time
+EXPORT_JOB_WORKERS = int(os.getenv("EXPORT_JOB_WORKERS", "2"))
+# Jobs waiting for a worker before new submissions are rejected
+EXPORT_JOB_QUEUE_SIZE = int(os.getenv("EXPORT_JOB_QUEUE_SIZE", "50"))
+# Finished jobs and their files are removed after this many seconds
+EXPORT_JOB_TTL_SECONDS = int(os.getenv("EXPORT_JOB_TTL_SECONDS", "86400"))
+# How often expired jobs are looked for
+EXPORT_JOB_CLEANUP_SECONDS = float(os.getenv("EXPORT_JOB_CLEANUP_SECONDS", "600"))
+
+# ---------- Constants ----------
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_COMPLETED = "completed"
+JOB_FAILED = "failed"
+
+
+class ExportJob:
+    """State of one export job. Only mutated from the event loop."""
+
+    def __init__(self, total_dates: int, filename: str, media_type: str = "application/zip",
+                 owner: Optional[str] = None):
+        self.job_id = uuid.uuid4().hex
+        self.owner = owner
+        self.status = JOB_QUEUED
+        self.total_dates = total_dates
+        self.completed_dates = 0
+        self.files_written = 0
+        self.filename = filename
+        self.media_type = media_type
+        self.path: Optional[str] = None
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.finished_at: Optional[float] = None
+
+    @property
+    def progress(self) -> float:
+        return self.completed_dates / self.total_dates if self.total_dates else 1.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.job_id,
+            "status": self.status,
+            "total_dates": self.total_dates,
+            "completed_dates": self.completed_dates,
+            "files_written": self.files_written,
+            "progress": round(self.progress, 4),
+            "error": self.error,
+        }
+
+
+# Runs a job and writes its output to the given path
+JobRunner = Callable[[ExportJob, str], Awaitable[None]]
+
+
+class ExportJobQueueFull(Exception):
+    """Raised when the job queue has no room for another job."""
+
+
+class ExportJobManager:
+    """
+    Runs export jobs on a fixed number of asyncio workers.
+
+    Workers belong to the event loop that started them, like the shared
+    GeoServer client; they are (re)started lazily on the running loop.
+    A cleanup task on the same loop removes expired jobs and their files
+    every `cleanup_seconds`. Since the registry only lives in memory, files
+    in `directory` not touched for `ttl_seconds` are swept as well, e.g.
+    outputs and partial files of jobs from before a restart.
+    """
+
+    def __init__(self, directory: str = EXPORT_JOBS_DIR, workers: int = EXPORT_JOB_WORKERS,
+                 queue_size: int = EXPORT_JOB_QUEUE_SIZE, ttl_seconds: int = EXPORT_JOB_TTL_SECONDS,
+                 cleanup_seconds: float = EXPORT_JOB_CLEANUP_SECONDS):
+        self.directory = directory
+        self.workers = workers
+        self.queue_size = queue_size
+        self.ttl_seconds = ttl_seconds
+        self.cleanup_seconds = cleanup_seconds
+        self._jobs: Dict[str, ExportJob] = {}
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def start(self) -> None:
+        """Start the workers on the running event loop."""
+        loop = asyncio.get_running_loop()
+        if self._loop is loop and self._tasks:
+            return
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._loop = loop
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._cleanup()))
+        self._remove_stale_files()
+        # Jobs queued on a previous loop cannot run anymore
+        for job in self._jobs.values():
+            if job.status in (JOB_QUEUED, JOB_RUNNING):
+                self._finish(job, JOB_FAILED, "Export interrupted by a restart")
+
+    async def stop(self) -> None:
+        """Cancel the workers. Called on application shutdown."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._loop = None
+
+    def submit(self, total_dates: int, filename: str, runner: JobRunner,
+               media_type: str = "application/zip", owner: Optional[str] = None) -> ExportJob:
+        """Queue a job and return it. Raises ExportJobQueueFull when the queue is full."""
+        self.start()
+        self._remove_expired()
+        job = ExportJob(total_dates, filename, media_type, owner)
+        try:
+            self._queue.put_nowait((job, runner))
+        except asyncio.QueueFull:
+            raise ExportJobQueueFull()
+        self._jobs[job.job_id] = job
+        logger.info("Queued export job %s (%d dates)", job.job_id, total_dates)
+        return job
+
+    def get(self, job_id: str, owner: Optional[str] = None) -> Optional[ExportJob]:
+        """Return the job, or None if it does not exist or belongs to someone else."""
+        job = self._jobs.get(job_id)
+        if job is None or job.owner != owner:
+            return None
+        return job
+
+    async def _worker(self) -> None:
+        while True:
+            job, runner = await self._queue.get()
+            try:
+                await self._run(job, runner)
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job: ExportJob, runner: JobRunner) -> None:
+        job.status = JOB_RUNNING
+        path = os.path.join(self.directory, job.job_id + os.path.splitext(job.filename)[1])
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            await runner(job, path)
+        except asyncio.CancelledError:
+            self._finish(job, JOB_FAILED, "Export cancelled")
+            self._remove_file(path)
+            raise
+        except Exception as e:
+            logger.exception("Export job %s failed", job.job_id)
+            self._finish(job, JOB_FAILED, str(e))
+            self._remove_file(path)
+            return
+        job.path = path
+        self._finish(job, JOB_COMPLETED)
+        logger.info("Export job %s completed (%d files)", job.job_id, job.files_written)
+
+    @staticmethod
+    def _finish(job: ExportJob, status: str, error: Optional[str] = None) -> None:
+        job.status = status
+        job.error = error
+        job.finished_at = time.time()
+
+    @staticmethod
+    def _remove_file(path: Optional[str]) -> None:
+        if path:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    async def _cleanup(self) -> None:
+        while True:
+            await asyncio.sleep(self.cleanup_seconds)
+            self._remove_expired()
+            self._remove_stale_files()
+
+    def _remove_expired(self) -> None:
+        """Forget finished jobs older than the TTL and delete their files."""
+        cutoff = time.time() - self.ttl_seconds
+        for job_id, job in list(self._jobs.items()):
+            if job.finished_at is not None and job.finished_at < cutoff:
+                self._remove_file(job.path)
+                del self._jobs[job_id]
+
+    def _remove_stale_files(self) -> None:
+        """Delete files in the jobs directory not modified within the TTL, except those of unfinished jobs."""
+        cutoff = time.time() - self.ttl_seconds
+        active = {job_id for job_id, job in self._jobs.items() if job.finished_at is None}
+        try:
+            entries = list(os.scandir(self.directory))
+        except OSError:
+            return
+        for entry in entries:
+            if entry.name.split(".", 1)[0] in active:
+                continue
+            try:
+                if entry.is_file() and entry.stat().st_mtime < cutoff:
+                    os.remove(entry.path)
+            except OSError:
+                pass
+
+
+export_jobs = ExportJobManager()
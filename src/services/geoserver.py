@@ -3,23 +3,27 @@ Shared GeoServer service module.
 
 Centralizes:
 - GeoServer connection configuration (URL, auth, HTTP session with connection pool)
+- Process-wide session lifecycle and connection pool metrics
 - Date generation logic (daily/monthly/annual)
-- WCS URL building
-- Raster download with shared session
+- WCS URL building (optionally windowed to a lon/lat bounding box)
+- Clustering of nearby coordinates into shared windows
 - Adaptive date limits based on temporality
 - Structured logging
 """
 
 import logging
+import math
 import os
+import threading
 from datetime import date, timedelta
-from typing import Dict, List, Literal, Optional, Tuple
+from typing import Any, Dict, List, Literal, Optional, Sequence, Tuple
 from urllib.parse import urlencode
 
 import requests
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
 
+
 # ---------- Logger ----------
 logger = logging.getLogger(__name__)
 
@@ -27,7 +31,19 @@ logger = logging.getLogger(__name__)
 GEOSERVER_URL = os.getenv("GEOSERVER_URL", "https://geo.aclimate.org/geoserver/")
 GEOSERVER_USER = os.getenv("GEOSERVER_USER")
 GEOSERVER_PASSWORD = os.getenv("GEOSERVER_PASSWORD")
-MAX_WORKERS = int(os.getenv("MAX_WORKERS", "4"))
+# Keep-alive pool of the shared requests session
+GEOSERVER_POOL_CONNECTIONS = int(os.getenv("GEOSERVER_POOL_CONNECTIONS", "10"))
+GEOSERVER_POOL_MAXSIZE = int(os.getenv("GEOSERVER_POOL_MAXSIZE", "20"))
+# Dates downloaded ahead of the one being streamed in raster exports
+RASTER_EXPORT_LOOKAHEAD = int(os.getenv("RASTER_EXPORT_LOOKAHEAD", "4"))
+# Margin (degrees) added around point bounding boxes so neighbour pixels are included
+BBOX_PADDING = float(os.getenv("GEOSERVER_BBOX_PADDING", "0.1"))
+# Grid cell (degrees) used to group nearby coordinates into one WCS window
+POINT_CLUSTER_SIZE = float(os.getenv("POINT_CLUSTER_SIZE", "0.5"))
+# (date, window) samples of a point time series processed at the same time
+POINT_TIMESERIES_BATCH_SIZE = int(os.getenv("POINT_TIMESERIES_BATCH_SIZE", "32"))
+# Windows per date of a point time series; above it one window covers every point
+POINT_TIMESERIES_MAX_WINDOWS = int(os.getenv("POINT_TIMESERIES_MAX_WINDOWS", "8"))
 
 # ---------- Constants ----------
 # Maximum dates allowed per temporality (sync mode)
@@ -36,9 +52,24 @@ MAX_DATES_BY_TEMPORALITY: Dict[str, int] = {
     "monthly": 12,
     "annual": 12,
 }
+# Maximum dates allowed per temporality (job mode, runs in the background)
+MAX_JOB_DATES_BY_TEMPORALITY: Dict[str, int] = {
+    "daily": 366,
+    "monthly": 120,
+    "annual": 50,
+}
+# Maximum dates allowed per temporality in point time series
+MAX_TIMESERIES_DATES_BY_TEMPORALITY: Dict[str, int] = {
+    "daily": 366,
+    "monthly": 120,
+    "annual": 50,
+}
 
 DEFAULT_TIMEOUT = 60  # seconds
 
+# (min_lon, min_lat, max_lon, max_lat)
+BBox = Tuple[float, float, float, float]
+
 
 # ---------- Auth ----------
 def get_geoserver_auth() -> Tuple[str, str]:
@@ -59,8 +90,9 @@ def get_geoserver_url() -> str:
 def create_geoserver_session() -> requests.Session:
     """
     Create a requests.Session with:
-    - Connection pooling (up to 20 connections)
-    - Retry strategy (3 retries, backoff factor 0.5)
+    - Connection pooling (sized by GEOSERVER_POOL_CONNECTIONS / GEOSERVER_POOL_MAXSIZE)
+    - Retry strategy (3 retries, backoff factor 0.5) for 500/502/504;
+      429/503 are left to the caller so retries don't add to an overload
     - Preconfigured basic auth
     - Longer timeout
     """
@@ -74,14 +106,14 @@ def create_geoserver_session() -> requests.Session:
     retries = Retry(
         total=3,
         backoff_factor=0.5,
-        status_forcelist=[429, 500, 502, 503, 504],
+        status_forcelist=[500, 502, 504],
         allowed_methods=["GET"],
     )
 
     # Mount adapters with connection pool and retry
     adapter = HTTPAdapter(
-        pool_connections=10,
-        pool_maxsize=20,
+        pool_connections=GEOSERVER_POOL_CONNECTIONS,
+        pool_maxsize=GEOSERVER_POOL_MAXSIZE,
         max_retries=retries,
     )
     session.mount("http://", adapter)
@@ -90,20 +122,80 @@ def create_geoserver_session() -> requests.Session:
     return session
 
 
-# Thread-local storage for session reuse across threads
-import threading
-_thread_local = threading.local()
+# Process-wide session shared by every thread; requests' connection pool is thread-safe
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+# Requests/connections of pools that were discarded by close_geoserver_session
+_closed_pool_totals = {"requests": 0, "connections": 0}
 
 
 def get_geoserver_session() -> requests.Session:
-    """Get or create a thread-local GeoServer session."""
-    if not hasattr(_thread_local, "session"):
-        _thread_local.session = create_geoserver_session()
-    return _thread_local.session
+    """Get or create the process-wide GeoServer session."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = create_geoserver_session()
+    return _session
+
+
+def open_geoserver_session() -> None:
+    """Create the shared session ahead of the first request. Called on application startup."""
+    get_geoserver_session()
+
+
+def close_geoserver_session() -> None:
+    """Close the shared session and its pooled connections. Called on application shutdown."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            return
+        totals = _session_pool_totals(_session)
+        _closed_pool_totals["requests"] += totals["requests"]
+        _closed_pool_totals["connections"] += totals["connections"]
+        _session.close()
+        _session = None
+
+
+def _session_pool_totals(session: requests.Session) -> Dict[str, int]:
+    """Sum request and new-connection counters over the session's urllib3 pools."""
+    totals = {"requests": 0, "connections": 0}
+    seen = set()
+    for adapter in session.adapters.values():
+        if id(adapter) in seen:
+            continue
+        seen.add(id(adapter))
+        pools = adapter.poolmanager.pools
+        for key in list(pools.keys()):
+            pool = pools.get(key)
+            if pool is not None:
+                totals["requests"] += pool.num_requests
+                totals["connections"] += pool.num_connections
+    return totals
+
+
+def get_session_pool_stats() -> Dict[str, int]:
+    """
+    Return connection pool metrics for the shared session.
+
+    A hit is a request served on an already open keep-alive connection;
+    a miss is a request that had to open a new connection.
+    """
+    with _session_lock:
+        totals = dict(_closed_pool_totals)
+        if _session is not None:
+            current = _session_pool_totals(_session)
+            totals["requests"] += current["requests"]
+            totals["connections"] += current["connections"]
+    return {
+        "requests": totals["requests"],
+        "hits": max(totals["requests"] - totals["connections"], 0),
+        "misses": totals["connections"],
+    }
 
 
 # ---------- Date generation ----------
-def generate_date_list(start: date, end: date, temporality: str) -> List[Dict[str, str]]:
+def generate_date_list(start: date, end: date, temporality: str) -> List[Dict[str, Any]]:
     """
     Generate a list of date info dictionaries from start to end,
     stepping by day, month, or year according to temporality.
@@ -111,7 +203,10 @@ def generate_date_list(start: date, end: date, temporality: str) -> List[Dict[st
     Each dict has:
         - "date_str": ISO-formatted date string (e.g. "2024-01-15")
         - "time_subset": WCS time subset parameter string
+        - "cacheable": True when the period has fully elapsed, so its
+          raster can no longer change and may be cached
     """
+    today = date.today()
     dates = []
     current = start
     while current <= end:
@@ -123,72 +218,96 @@ def generate_date_list(start: date, end: date, temporality: str) -> List[Dict[st
             time_subset = f"Time(\"{year:04d}-{month:02d}-{day:02d}T00:00:00.000Z\")"
             date_str = f"{year:04d}-{month:02d}-{day:02d}"
             current += timedelta(days=1)
+            period_end = date(year, month, day) + timedelta(days=1)
         elif temporality == "monthly":
             time_subset = f"Time(\"{year:04d}-{month:02d}-01T00:00:00.000Z\")"
             date_str = f"{year:04d}-{month:02d}-01"
             if month == 12:
                 current = current.replace(year=year + 1, month=1)
+                period_end = date(year + 1, 1, 1)
             else:
                 current = current.replace(month=month + 1)
+                period_end = date(year, month + 1, 1)
         elif temporality == "annual":
             time_subset = f"Time(\"{year:04d}-01-01T00:00:00.000Z\")"
             date_str = f"{year:04d}-01-01"
             current = current.replace(year=year + 1)
+            period_end = date(year + 1, 1, 1)
         else:
             raise ValueError(f"Unknown temporality: {temporality}")
 
-        dates.append({"date_str": date_str, "time_subset": time_subset})
+        dates.append({
+            "date_str": date_str,
+            "time_subset": time_subset,
+            "cacheable": period_end <= today,
+        })
 
     return dates
 
 
-def get_max_dates_for_temporality(temporality: str) -> int:
-    """Return the maximum number of dates allowed for the given temporality."""
+def get_max_dates_for_temporality(temporality: str, mode: str = "sync") -> int:
+    """
+    Return the maximum number of dates allowed for the given temporality and
+    mode: "sync" or "job" raster exports, or "timeseries" point extraction.
+    """
+    if mode == "job":
+        return MAX_JOB_DATES_BY_TEMPORALITY.get(temporality, 366)
+    if mode == "timeseries":
+        return MAX_TIMESERIES_DATES_BY_TEMPORALITY.get(temporality, 366)
     return MAX_DATES_BY_TEMPORALITY.get(temporality, 7)
 
 
 # ---------- WCS URL building ----------
-def build_wcs_url(workspace: str, store: str, time_subset: str) -> str:
+def get_coordinates_bbox(coordinates: Sequence[Sequence[float]], padding: float = BBOX_PADDING) -> BBox:
     """
-    Build a WCS GetCoverage URL for the given parameters.
+    Return the padded (min_lon, min_lat, max_lon, max_lat) box enclosing
+    a list of [lon, lat] coordinates.
     """
-    url_root = get_geoserver_url()
-    params = {
-        "service": "WCS",
-        "request": "GetCoverage",
-        "version": "2.0.1",
-        "coverageId": store,
-        "format": "image/geotiff",
-        "subset": time_subset,
-    }
-    return f"{url_root}{workspace}/ows?" + urlencode(params)
+    lons = [coord[0] for coord in coordinates]
+    lats = [coord[1] for coord in coordinates]
+    return (
+        min(lons) - padding,
+        min(lats) - padding,
+        max(lons) + padding,
+        max(lats) + padding,
+    )
+
+
+def cluster_coordinates(coordinates: Sequence[Sequence[float]],
+                        cell_size: float = POINT_CLUSTER_SIZE,
+                        max_clusters: Optional[int] = None) -> List[List[int]]:
+    """
+    Group coordinate indices by the cell_size x cell_size degree cell they fall
+    in, so nearby points can share one small WCS window. Groups keep input order.
+    If that gives more than max_clusters groups, every index goes in one group.
+    """
+    clusters: Dict[Tuple[int, int], List[int]] = {}
+    for index, (lon, lat) in enumerate(coord[:2] for coord in coordinates):
+        cell = (math.floor(lon / cell_size), math.floor(lat / cell_size))
+        clusters.setdefault(cell, []).append(index)
+    if max_clusters is not None and len(clusters) > max_clusters:
+        return [list(range(len(coordinates)))]
+    return list(clusters.values())
 
 
-# ---------- Raster download ----------
-def download_raster(
-    workspace: str,
-    store: str,
-    time_subset: str,
-    session: Optional[requests.Session] = None,
-) -> Tuple[str, Optional[bytes]]:
+def build_wcs_url(workspace: str, store: str, time_subset: str, bbox: Optional[BBox] = None) -> str:
     """
-    Download a single raster from GeoServer.
+    Build a WCS GetCoverage URL for the given parameters.
 
-    Returns a tuple of (time_subset, bytes_content).
-    Returns (time_subset, None) if the raster is not found (404) or on error.
+    When a bbox is given, Long/Lat subsets are added so GeoServer only
+    returns the window covering it instead of the whole coverage.
     """
-    url = build_wcs_url(workspace, store, time_subset)
-    if session is None:
-        session = get_geoserver_session()
-
-    try:
-        resp = session.get(url, timeout=DEFAULT_TIMEOUT)
-        if resp.status_code == 404:
-            logger.warning("Raster not found (404) for coverage=%s, time=%s", store, time_subset)
-            return time_subset, None
-        resp.raise_for_status()
-        logger.info("Downloaded raster for coverage=%s, time=%s (%d bytes)", store, time_subset, len(resp.content))
-        return time_subset, resp.content
-    except requests.exceptions.RequestException as e:
-        logger.error("Error downloading raster for coverage=%s, time=%s: %s", store, time_subset, str(e))
-        return time_subset, None
\ No newline at end of file
+    url_root = get_geoserver_url()
+    params = [
+        ("service", "WCS"),
+        ("request", "GetCoverage"),
+        ("version", "2.0.1"),
+        ("coverageId", store),
+        ("format", "image/geotiff"),
+        ("subset", time_subset),
+    ]
+    if bbox is not None:
+        min_lon, min_lat, max_lon, max_lat = bbox
+        params.append(("subset", f"Long({min_lon},{max_lon})"))
+        params.append(("subset", f"Lat({min_lat},{max_lat})"))
+    return f"{url_root}{workspace}/ows?" + urlencode(params)
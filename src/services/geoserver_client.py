@@ -0,0 +1,235 @@
+"""
+Async GeoServer client.
+
+Centralizes:
+- One shared httpx.AsyncClient (keep-alive connection pool) per process
+- Adaptive, process-wide limit on concurrent GeoServer requests
+- Retries with exponential backoff for transient errors
+- Connection pool hit/miss counters
+- Coverage downloads backed by the on-disk raster cache
+- Single-flight deduplication of identical in-flight downloads
+"""
+
+import asyncio
+import logging
+import os
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+import httpx
+from starlette.concurrency import run_in_threadpool
+
+from services.geoserver import (
+    BBox,
+    DEFAULT_TIMEOUT,
+    GEOSERVER_PASSWORD,
+    GEOSERVER_USER,
+    build_wcs_url,
+)
+from services.geoserver_governor import GEOSERVER_CONCURRENCY_CEILING, ConcurrencyGovernor
+from services.raster_cache import RasterDiskCache, get_raster_cache
+
+# ---------- Logger ----------
+logger = logging.getLogger(__name__)
+
+# ---------- Configuration from environment ----------
+GEOSERVER_MAX_CONNECTIONS = int(os.getenv("GEOSERVER_MAX_CONNECTIONS", "20"))
+
+# ---------- Constants ----------
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+MAX_RETRIES = 3
+BACKOFF_FACTOR = 0.5  # seconds, doubled on every retry
+
+
+class SingleFlight:
+    """
+    Share one in-flight task between concurrent callers with the same key.
+
+    The task is shielded, so a caller that is cancelled (e.g. its client
+    disconnected) does not cancel the work for the others.
+    """
+
+    def __init__(self):
+        self._tasks: Dict[Hashable, asyncio.Future] = {}
+        self.coalesced = 0
+
+    async def run(self, key: Hashable, factory: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._tasks.get(key)
+        if task is None or task.get_loop() is not asyncio.get_running_loop():
+            task = asyncio.ensure_future(factory())
+            self._tasks[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+    def _forget(self, key: Hashable, task: asyncio.Future) -> None:
+        if self._tasks.get(key) is task:
+            del self._tasks[key]
+        # Retrieve the exception so it is not reported when every caller went away
+        if not task.cancelled():
+            task.exception()
+
+
+class AsyncGeoServerClient:
+    """
+    Async HTTP client for GeoServer sharing one connection pool and one
+    adaptive concurrency governor between every caller on the event loop.
+    """
+
+    def __init__(self, max_connections: int = GEOSERVER_MAX_CONNECTIONS,
+                 governor: Optional[ConcurrencyGovernor] = None,
+                 timeout: float = DEFAULT_TIMEOUT):
+        auth = (GEOSERVER_USER, GEOSERVER_PASSWORD) if GEOSERVER_USER and GEOSERVER_PASSWORD else None
+        self._client = httpx.AsyncClient(
+            auth=auth,
+            timeout=timeout,
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections,
+            ),
+        )
+        # A window wider than the pool would only queue requests inside httpx,
+        # inflating the latency signal and reporting pool timeouts as failures
+        self.governor = governor or ConcurrencyGovernor(
+            maximum=min(GEOSERVER_CONCURRENCY_CEILING, max_connections)
+        )
+        self._downloads = SingleFlight()
+        self.requests = 0
+        self.new_connections = 0
+
+    async def _trace(self, event_name: str, info: Dict[str, Any]) -> None:
+        """httpcore trace hook; counts requests that had to open a new connection."""
+        if event_name == "connection.connect_tcp.complete":
+            self.new_connections += 1
+
+    def pool_stats(self) -> Dict[str, int]:
+        """Return request, hit (reused connection) and miss (new connection) counters."""
+        return {
+            "requests": self.requests,
+            "hits": max(self.requests - self.new_connections, 0),
+            "misses": self.new_connections,
+        }
+
+    async def get(self, url: str) -> httpx.Response:
+        """
+        GET a URL under the shared concurrency governor, retrying transient
+        errors. Backoff sleeps do not hold a concurrency slot, and every
+        retry goes through the governor again, so retries shrink with the
+        window and stop while the circuit is open (GeoServerUnavailable).
+        """
+        for attempt in range(MAX_RETRIES + 1):
+            try:
+                async with self.governor.slot() as outcome:
+                    self.requests += 1
+                    try:
+                        resp = await self._client.get(url, extensions={"trace": self._trace})
+                    except httpx.TransportError:
+                        outcome.transport_error()
+                        raise
+                    outcome.response(resp.status_code)
+                if resp.status_code not in RETRY_STATUSES or attempt == MAX_RETRIES:
+                    return resp
+                logger.warning("GeoServer returned %d, retrying (%d/%d)", resp.status_code, attempt + 1, MAX_RETRIES)
+            except httpx.TransportError as e:
+                if attempt == MAX_RETRIES:
+                    raise
+                logger.warning("GeoServer transport error, retrying (%d/%d): %s", attempt + 1, MAX_RETRIES, e)
+            await asyncio.sleep(BACKOFF_FACTOR * 2 ** attempt)
+
+    async def download_raster(
+        self,
+        workspace: str,
+        store: str,
+        time_subset: str,
+        bbox: Optional[BBox] = None,
+        cache: bool = False,
+    ) -> Tuple[str, Optional[bytes]]:
+        """
+        Download one coverage, optionally windowed to a bbox. With cache=True
+        the on-disk raster cache is checked first and filled after a
+        successful download.
+
+        Returns (time_subset, content), or (time_subset, None) if the raster
+        is not found (404) or on error. Concurrent calls for the same WCS URL
+        share a single download.
+        """
+        raster_cache = get_raster_cache() if cache else None
+        cache_key = None
+        if raster_cache is not None:
+            cache_key = RasterDiskCache.make_key(workspace, store, time_subset, bbox)
+            cached = await run_in_threadpool(raster_cache.get, cache_key)
+            if cached is not None:
+                logger.info("Raster cache hit for coverage=%s, time=%s", store, time_subset)
+                return time_subset, cached
+
+        # Concurrent requests for the same coverage share one download
+        url = build_wcs_url(workspace, store, time_subset, bbox)
+        content = await self._downloads.run(
+            url, lambda: self._download(url, store, time_subset, cache_key)
+        )
+        return time_subset, content
+
+    async def _download(self, url: str, store: str, time_subset: str,
+                        cache_key: Optional[str]) -> Optional[bytes]:
+        """Download a coverage, storing it in the raster cache under cache_key if given."""
+        try:
+            resp = await self.get(url)
+            if resp.status_code == 404:
+                logger.warning("Raster not found (404) for coverage=%s, time=%s", store, time_subset)
+                return None
+            resp.raise_for_status()
+        except httpx.HTTPError as e:
+            logger.error("Error downloading raster for coverage=%s, time=%s: %s", store, time_subset, str(e))
+            return None
+
+        logger.info("Downloaded raster for coverage=%s, time=%s (%d bytes)", store, time_subset, len(resp.content))
+        # GeoServer reports WCS errors as XML, so only image responses are cached
+        raster_cache = get_raster_cache() if cache_key else None
+        if raster_cache is not None and resp.headers.get("Content-Type", "").startswith("image/"):
+            await run_in_threadpool(raster_cache.put, cache_key, resp.content)
+        return resp.content
+
+    def coalesced(self) -> int:
+        """Number of downloads that joined an identical one already in flight."""
+        return self._downloads.coalesced
+
+    async def aclose(self) -> None:
+        await self._client.aclose()
+
+
+# One client per event loop; in production that is one per process
+_client: Optional[AsyncGeoServerClient] = None
+_client_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def get_async_geoserver_client() -> AsyncGeoServerClient:
+    """Return the shared async GeoServer client for the running event loop."""
+    global _client, _client_loop
+    loop = asyncio.get_running_loop()
+    if _client is None or _client_loop is not loop:
+        _client = AsyncGeoServerClient()
+        _client_loop = loop
+    return _client
+
+
+def get_async_pool_stats() -> Dict[str, int]:
+    """Return connection pool metrics of the shared async client."""
+    if _client is None:
+        return {"requests": 0, "hits": 0, "misses": 0}
+    return _client.pool_stats()
+
+
+def get_governor_stats() -> Optional[Dict[str, Any]]:
+    """Return the concurrency governor state of the shared async client, if any."""
+    if _client is None:
+        return None
+    return _client.governor.stats()
+
+
+async def close_async_geoserver_client() -> None:
+    """Close the shared client. Called on application shutdown."""
+    global _client, _client_loop
+    if _client is not None and _client_loop is asyncio.get_running_loop():
+        await _client.aclose()
+    _client = None
+    _client_loop = None
@@ -0,0 +1,191 @@
+"""
+Adaptive GeoServer concurrency governor.
+
+Centralizes:
+- A process-wide limit on GeoServer requests in flight
+- AIMD window driven by observed latency and 429/503 responses
+- Circuit breaker that sheds load while GeoServer is overloaded or down
+"""
+
+import asyncio
+import logging
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Optional
+
+# ---------- Logger ----------
+logger = logging.getLogger(__name__)
+
+# ---------- Configuration from environment ----------
+# Initial and bounding sizes of the concurrency window
+GEOSERVER_MAX_CONCURRENCY = int(os.getenv("GEOSERVER_MAX_CONCURRENCY", "8"))
+GEOSERVER_MIN_CONCURRENCY = int(os.getenv("GEOSERVER_MIN_CONCURRENCY", "1"))
+GEOSERVER_CONCURRENCY_CEILING = int(os.getenv("GEOSERVER_CONCURRENCY_CEILING", "32"))
+# Responses slower than this shrink the window (seconds)
+GEOSERVER_TARGET_LATENCY = float(os.getenv("GEOSERVER_TARGET_LATENCY", "10"))
+# Consecutive 5xx responses/transport errors that open the circuit, and how long it stays open
+GEOSERVER_BREAKER_THRESHOLD = int(os.getenv("GEOSERVER_BREAKER_THRESHOLD", "5"))
+GEOSERVER_BREAKER_COOLDOWN = float(os.getenv("GEOSERVER_BREAKER_COOLDOWN", "30"))
+
+# ---------- Constants ----------
+OVERLOAD_STATUSES = {429, 503}
+DECREASE_FACTOR = 0.5  # on overload
+SLOW_DECREASE_FACTOR = 0.9  # on slow responses
+LATENCY_SMOOTHING = 0.2  # weight of the newest sample in the latency EWMA
+
+BREAKER_CLOSED = "closed"
+BREAKER_OPEN = "open"
+BREAKER_HALF_OPEN = "half_open"
+
+
+class GeoServerUnavailable(Exception):
+    """Raised while the circuit breaker is open. Routes answer it with a 503."""
+
+    def __init__(self, message: str = "GeoServer is temporarily unavailable, try again later"):
+        super().__init__(message)
+
+
+class ConcurrencyGovernor:
+    """
+    Limits GeoServer requests in flight with an AIMD window.
+
+    The window grows by about one slot per window of fast successful
+    responses, halves on 429/503 (at most once per window of requests) and
+    shrinks slightly on responses slower than the target latency. After
+    `breaker_threshold` consecutive 5xx responses or transport errors the
+    circuit opens: new requests fail fast for `breaker_cooldown` seconds,
+    then a single probe request decides whether it closes again.
+    Requests that end without a reported result (cancelled by a client
+    disconnect, or failed before reaching GeoServer) only free their slot.
+    Only used from the event loop.
+    """
+
+    def __init__(self, initial: int = GEOSERVER_MAX_CONCURRENCY,
+                 minimum: int = GEOSERVER_MIN_CONCURRENCY,
+                 maximum: int = GEOSERVER_CONCURRENCY_CEILING,
+                 target_latency: float = GEOSERVER_TARGET_LATENCY,
+                 breaker_threshold: int = GEOSERVER_BREAKER_THRESHOLD,
+                 breaker_cooldown: float = GEOSERVER_BREAKER_COOLDOWN):
+        self.minimum = max(1, minimum)
+        self.maximum = max(self.minimum, maximum)
+        self.limit = float(min(max(initial, self.minimum), self.maximum))
+        self.target_latency = target_latency
+        self.breaker_threshold = breaker_threshold
+        self.breaker_cooldown = breaker_cooldown
+
+        self.in_flight = 0
+        self.latency: Optional[float] = None
+        self.requests = 0
+        self.overloads = 0
+        self.breaker = BREAKER_CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._last_decrease_at: Optional[int] = None  # value of self.requests at the last decrease
+        self._condition = asyncio.Condition()
+
+    def _check_breaker(self) -> bool:
+        """Raise if the circuit is open; return True if this request is the half-open probe."""
+        if self.breaker == BREAKER_OPEN:
+            if time.monotonic() - self._opened_at < self.breaker_cooldown:
+                raise GeoServerUnavailable()
+            self.breaker = BREAKER_HALF_OPEN
+        if self.breaker == BREAKER_HALF_OPEN:
+            if self._probe_in_flight:
+                raise GeoServerUnavailable()
+            self._probe_in_flight = True
+            return True
+        return False
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator["RequestOutcome"]:
+        """
+        Hold one concurrency slot for a GeoServer request. The caller reports
+        the result on the yielded outcome: the HTTP status, or a transport
+        error. Cancelled and unreported exits are not recorded.
+        """
+        async with self._condition:
+            await self._condition.wait_for(lambda: self.in_flight < int(self.limit))
+            probe = self._check_breaker()
+            self.in_flight += 1
+
+        outcome = RequestOutcome()
+        started = time.monotonic()
+        cancelled = False
+        try:
+            yield outcome
+        except asyncio.CancelledError:
+            cancelled = True
+            raise
+        finally:
+            latency = time.monotonic() - started
+            async with self._condition:
+                self.in_flight -= 1
+                if probe:
+                    self._probe_in_flight = False
+                if not cancelled and outcome.reported:
+                    self._record(outcome.status, latency)
+                self._condition.notify_all()
+
+    def _record(self, status: Optional[int], latency: float) -> None:
+        self.requests += 1
+        overloaded = status is None or status in OVERLOAD_STATUSES
+
+        if overloaded or status >= 500:
+            self._failures += 1
+            if overloaded:
+                self.overloads += 1
+                self._decrease(DECREASE_FACTOR)
+            if self.breaker == BREAKER_HALF_OPEN or self._failures >= self.breaker_threshold:
+                if self.breaker != BREAKER_OPEN:
+                    logger.warning("GeoServer circuit opened after %d failures", self._failures)
+                self.breaker = BREAKER_OPEN
+                self._opened_at = time.monotonic()
+            return
+
+        self._failures = 0
+        if self.breaker != BREAKER_CLOSED:
+            logger.info("GeoServer circuit closed")
+            self.breaker = BREAKER_CLOSED
+
+        self.latency = latency if self.latency is None else (
+            LATENCY_SMOOTHING * latency + (1 - LATENCY_SMOOTHING) * self.latency
+        )
+        if latency > self.target_latency:
+            self._decrease(SLOW_DECREASE_FACTOR)
+        else:
+            self.limit = min(self.maximum, self.limit + 1 / self.limit)
+
+    def _decrease(self, factor: float) -> None:
+        # Responses of requests started before the last decrease do not count again
+        if self._last_decrease_at is not None and self.requests - self._last_decrease_at < self.limit:
+            return
+        self.limit = max(self.minimum, self.limit * factor)
+        self._last_decrease_at = self.requests
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "limit": int(self.limit),
+            "in_flight": self.in_flight,
+            "latency": round(self.latency, 3) if self.latency is not None else None,
+            "requests": self.requests,
+            "overloads": self.overloads,
+            "breaker": self.breaker,
+        }
+
+
+class RequestOutcome:
+    """Result of one governed request: an HTTP status or a transport error."""
+
+    def __init__(self):
+        self.status: Optional[int] = None
+        self.reported = False
+
+    def response(self, status: int) -> None:
+        self.status = status
+        self.reported = True
+
+    def transport_error(self) -> None:
+        self.status = None
+        self.reported = True
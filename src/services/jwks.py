@@ -0,0 +1,256 @@
+"""
+Shared Keycloak JWKS key store.
+
+Centralizes:
+- One process-wide cache of the realm's signing keys, indexed by kid
+- Pre-parsed key objects, so token validation is pure CPU
+- Background refresher that renews the keys before they expire
+- Coalesced refetches and fallback to the last good keys on Keycloak outages
+"""
+
+import asyncio
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import requests
+from fastapi import HTTPException
+from jose import jwk
+from jose.backends.base import Key
+from jose.exceptions import JWKError
+
+# ---------- Logger ----------
+logger = logging.getLogger(__name__)
+
+# ---------- Configuration from environment ----------
+JWKS_TTL_SECONDS = int(os.getenv("JWKS_TTL_SECONDS", "300"))
+JWKS_TIMEOUT = float(os.getenv("JWKS_TIMEOUT", "10"))
+# Minimum time between refetches triggered by tokens with an unknown kid
+JWKS_MIN_REFETCH_SECONDS = float(os.getenv("JWKS_MIN_REFETCH_SECONDS", "10"))
+# Period of the background refresher; shorter than the TTL so keys never go stale
+JWKS_REFRESH_SECONDS = float(os.getenv("JWKS_REFRESH_SECONDS", str(JWKS_TTL_SECONDS * 0.8)))
+# Delay before the background refresher retries a failed refresh
+JWKS_RETRY_SECONDS = float(os.getenv("JWKS_RETRY_SECONDS", "15"))
+
+# ---------- Constants ----------
+JWKS_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (compatible; AclimateAPI/3.0)",
+    "Accept": "application/json",
+}
+
+
+def get_keycloak_issuer() -> str:
+    """Return the issuer URL of the configured Keycloak realm."""
+    keycloak_url = os.getenv("KEYCLOAK_URL", "http://localhost:8080")
+    realm_name = os.getenv("REALM_NAME", "aclimate")
+    return f"{keycloak_url}/realms/{realm_name}"
+
+
+def get_jwks_url() -> str:
+    """Return the JWKS endpoint of the configured Keycloak realm."""
+    return f"{get_keycloak_issuer()}/protocol/openid-connect/certs"
+
+
+class JWKSet:
+    """Keys of one JWKS document, indexed by kid, with lazily parsed key objects."""
+
+    def __init__(self, keys: List[Dict[str, Any]], fetched_at: float):
+        self.keys = keys
+        self.fetched_at = fetched_at
+        self.by_kid: Dict[str, Dict[str, Any]] = {k["kid"]: k for k in keys if "kid" in k}
+        self._parsed: Dict[Tuple[str, str], Key] = {}
+
+    def get_key(self, kid: str, alg: str) -> Optional[Key]:
+        """Return the parsed key for kid and alg, or None if kid is unknown."""
+        parsed = self._parsed.get((kid, alg))
+        if parsed is not None:
+            return parsed
+        key_data = self.by_kid.get(kid)
+        if key_data is None:
+            return None
+        try:
+            parsed = jwk.construct(key_data, key_data.get("alg", alg))
+        except JWKError as e:
+            logger.warning("Unusable JWKS key %s: %s", kid, e)
+            return None
+        self._parsed[(kid, alg)] = parsed
+        return parsed
+
+
+class JWKSKeyStore:
+    """
+    Thread-safe store of JWKS key sets, one per JWKS URL.
+
+    Once started, a background task refreshes the realm's keys every
+    `refresh_seconds`, so requests find them fresh. Without it, the first
+    request for a URL fetches the keys, and expired key sets keep being
+    served while a single background refresh runs (stale-while-revalidate).
+    A token signed with an unknown kid triggers an immediate refetch, at
+    most once per JWKS_MIN_REFETCH_SECONDS since the last attempt, failed
+    or not. Concurrent refreshes of a URL share one fetch and its outcome,
+    and a failed refresh keeps the last good keys.
+    """
+
+    def __init__(self, ttl_seconds: int = JWKS_TTL_SECONDS,
+                 min_refetch_seconds: float = JWKS_MIN_REFETCH_SECONDS,
+                 refresh_seconds: float = JWKS_REFRESH_SECONDS,
+                 retry_seconds: float = JWKS_RETRY_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        self.min_refetch_seconds = min_refetch_seconds
+        self.refresh_seconds = refresh_seconds
+        self.retry_seconds = retry_seconds
+        self._lock = threading.Lock()
+        self._sets: Dict[str, JWKSet] = {}
+        self._refreshing: set = set()
+        self._fetch_locks: Dict[str, threading.Lock] = {}
+        # Monotonic time the last fetch of each URL finished, successful or not
+        self._attempted_at: Dict[str, float] = {}
+        # Last failed fetch of each URL, shared with the callers that waited on it
+        self._failures: Dict[str, Tuple[float, HTTPException]] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def _fetch(self, url: str) -> JWKSet:
+        """
+        Fetch a JWKS document. Raises HTTPException 503 when Keycloak can't be
+        reached or answers with something that is not a JWKS document.
+        """
+        try:
+            response = requests.get(url, timeout=JWKS_TIMEOUT, headers=JWKS_HEADERS)
+        except requests.exceptions.RequestException as e:
+            logger.error(f"Error de conexión al obtener JWKS: {e}")
+            raise HTTPException(status_code=503, detail=f"No se pudo obtener las claves públicas (JWKS): {str(e)}")
+        if response.status_code != 200:
+            logger.error(f"JWKS respondió {response.status_code}: {response.text}")
+            raise HTTPException(status_code=503, detail=f"No se pudo obtener las claves públicas (JWKS): status {response.status_code}")
+        try:
+            keys = response.json()["keys"]
+            if not isinstance(keys, list):
+                raise TypeError("'keys' is not a list")
+            return JWKSet(keys, time.monotonic())
+        except (ValueError, KeyError, TypeError) as e:
+            logger.error(f"JWKS con formato inválido: {e}")
+            raise HTTPException(status_code=503, detail="No se pudo obtener las claves públicas (JWKS): respuesta inválida")
+
+    def refresh(self, url: str) -> JWKSet:
+        """
+        Fetch and store the keys of url. Callers that arrive while a fetch
+        is running wait for it and share its result, or its error, instead
+        of fetching again.
+        """
+        requested_at = time.monotonic()
+        with self._lock:
+            fetch_lock = self._fetch_locks.setdefault(url, threading.Lock())
+        with fetch_lock:
+            key_set = self._sets.get(url)
+            if key_set is not None and key_set.fetched_at >= requested_at:
+                return key_set
+            failure = self._failures.get(url)
+            if failure is not None and failure[0] >= requested_at:
+                raise HTTPException(status_code=failure[1].status_code, detail=failure[1].detail)
+            try:
+                key_set = self._fetch(url)
+            except HTTPException as e:
+                with self._lock:
+                    self._attempted_at[url] = time.monotonic()
+                    self._failures[url] = (self._attempted_at[url], e)
+                raise
+            with self._lock:
+                self._sets[url] = key_set
+                self._attempted_at[url] = time.monotonic()
+                self._failures.pop(url, None)
+            return key_set
+
+    def _refetch_allowed(self, url: str) -> bool:
+        """Whether enough time passed since the last fetch of url, failed or not."""
+        attempted_at = self._attempted_at.get(url)
+        return attempted_at is None or time.monotonic() - attempted_at >= self.min_refetch_seconds
+
+    def _refresh_or_cached(self, url: str) -> JWKSet:
+        """Refresh url, falling back to its last good keys if Keycloak can't be reached."""
+        try:
+            return self.refresh(url)
+        except HTTPException:
+            key_set = self._sets.get(url)
+            if key_set is None:
+                raise
+            logger.warning("JWKS refresh failed; serving the last good keys")
+            return key_set
+
+    def _refresh_in_background(self, url: str) -> None:
+        with self._lock:
+            if url in self._refreshing:
+                return
+            self._refreshing.add(url)
+
+        def run():
+            try:
+                self.refresh(url)
+            except HTTPException:
+                logger.warning("Background JWKS refresh failed; serving the cached keys")
+            finally:
+                with self._lock:
+                    self._refreshing.discard(url)
+
+        threading.Thread(target=run, name="jwks-refresh", daemon=True).start()
+
+    def get_key_set(self, url: Optional[str] = None) -> JWKSet:
+        """Return the key set of url (the configured realm by default)."""
+        url = url or get_jwks_url()
+        key_set = self._sets.get(url)
+        if key_set is None:
+            failure = self._failures.get(url)
+            if failure is not None and not self._refetch_allowed(url):
+                # Keycloak just failed and there are no keys to fall back to
+                raise HTTPException(status_code=failure[1].status_code, detail=failure[1].detail)
+            return self.refresh(url)
+        if time.monotonic() - key_set.fetched_at >= self.ttl_seconds:
+            self._refresh_in_background(url)
+        return key_set
+
+    def get_signing_key(self, kid: str, alg: str, url: Optional[str] = None) -> Optional[Key]:
+        """
+        Return the parsed key for a token header, refetching the JWKS once if
+        the kid is unknown (e.g. right after a key rotation). None if not found.
+        """
+        url = url or get_jwks_url()
+        key_set = self.get_key_set(url)
+        key = key_set.get_key(kid, alg)
+        if key is None and kid not in key_set.by_kid and self._refetch_allowed(url):
+            key = self._refresh_or_cached(url).get_key(kid, alg)
+        return key
+
+    # ---------- Background refresher ----------
+    async def _run_refresher(self) -> None:
+        while True:
+            try:
+                await asyncio.to_thread(self.refresh, get_jwks_url())
+                delay = self.refresh_seconds
+            except Exception:
+                logger.exception("Scheduled JWKS refresh failed; retrying in %ss", self.retry_seconds)
+                delay = min(self.retry_seconds, self.refresh_seconds)
+            await asyncio.sleep(delay)
+
+    def start(self) -> None:
+        """Start the background refresher on the running event loop."""
+        if self._task is not None and not self._task.done():
+            return
+        self._task = asyncio.get_running_loop().create_task(self._run_refresher())
+
+    async def stop(self) -> None:
+        """Cancel the background refresher. Called on application shutdown."""
+        if self._task is None:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+    def clear(self) -> None:
+        with self._lock:
+            self._sets.clear()
+            self._attempted_at.clear()
+            self._failures.clear()
+
+
+jwks_store = JWKSKeyStore()
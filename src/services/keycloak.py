@@ -0,0 +1,152 @@
+"""
+Shared async Keycloak client.
+
+Centralizes:
+- One httpx.AsyncClient (keep-alive connection pool) for Keycloak calls
+- Connect/read timeouts and pool limits
+- Grants against the configured realm's token endpoint, and its admin API root
+- Cached client_credentials tokens, refreshed with single-flight
+"""
+
+import asyncio
+import logging
+import os
+import time
+from typing import Dict, Optional, Tuple
+
+import httpx
+from fastapi import HTTPException
+
+from services.jwks import get_keycloak_issuer
+
+# ---------- Logger ----------
+logger = logging.getLogger(__name__)
+
+# ---------- Configuration from environment ----------
+KEYCLOAK_TIMEOUT = float(os.getenv("KEYCLOAK_TIMEOUT", "10"))
+KEYCLOAK_CONNECT_TIMEOUT = float(os.getenv("KEYCLOAK_CONNECT_TIMEOUT", "5"))
+KEYCLOAK_MAX_CONNECTIONS = int(os.getenv("KEYCLOAK_MAX_CONNECTIONS", "50"))
+KEYCLOAK_MAX_KEEPALIVE = int(os.getenv("KEYCLOAK_MAX_KEEPALIVE", "20"))
+# Cached client tokens are renewed this many seconds before they expire
+KEYCLOAK_TOKEN_REFRESH_MARGIN = float(os.getenv("KEYCLOAK_TOKEN_REFRESH_MARGIN", "30"))
+
+# ---------- Constants ----------
+FORM_HEADERS = {"Content-Type": "application/x-www-form-urlencoded"}
+
+
+def get_token_url() -> str:
+    """Return the token endpoint of the configured Keycloak realm."""
+    return f"{get_keycloak_issuer()}/protocol/openid-connect/token"
+
+
+def get_admin_url() -> str:
+    """Return the admin REST API root of the configured Keycloak realm."""
+    keycloak_url = os.getenv("KEYCLOAK_URL", "http://localhost:8080")
+    realm_name = os.getenv("REALM_NAME", "aclimate")
+    return f"{keycloak_url}/admin/realms/{realm_name}"
+
+
+# One client per event loop; in production that is one per process
+_client: Optional[httpx.AsyncClient] = None
+_client_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def get_keycloak_client() -> httpx.AsyncClient:
+    """Return the shared async Keycloak client for the running event loop."""
+    global _client, _client_loop
+    loop = asyncio.get_running_loop()
+    if _client is None or _client_loop is not loop:
+        _client = httpx.AsyncClient(
+            timeout=httpx.Timeout(KEYCLOAK_TIMEOUT, connect=KEYCLOAK_CONNECT_TIMEOUT),
+            limits=httpx.Limits(
+                max_connections=KEYCLOAK_MAX_CONNECTIONS,
+                max_keepalive_connections=KEYCLOAK_MAX_KEEPALIVE,
+            ),
+        )
+        _client_loop = loop
+    return _client
+
+
+async def close_keycloak_client() -> None:
+    """Close the shared client. Called on application shutdown."""
+    global _client, _client_loop
+    if _client is not None and _client_loop is asyncio.get_running_loop():
+        await _client.aclose()
+    _client = None
+    _client_loop = None
+
+
+async def request_token(data: Dict[str, Optional[str]]) -> httpx.Response:
+    """
+    POST a grant to the realm's token endpoint and return Keycloak's response.
+    Raises HTTPException 503 when Keycloak can't be reached in time.
+    """
+    try:
+        return await get_keycloak_client().post(get_token_url(), data=data, headers=FORM_HEADERS)
+    except httpx.HTTPError as e:
+        logger.error(f"Error de conexión con Keycloak: {e}")
+        raise HTTPException(status_code=503, detail="Keycloak is temporarily unavailable")
+
+
+class ClientTokenManager:
+    """
+    Cache of a client_credentials access token.
+
+    The token is reused until `refresh_margin` seconds before its
+    expires_in (or half its lifetime, for short-lived tokens). Concurrent
+    callers that find it missing or stale wait for a single grant.
+    Only used from the event loop.
+    """
+
+    def __init__(self, refresh_margin: float = KEYCLOAK_TOKEN_REFRESH_MARGIN):
+        self.refresh_margin = refresh_margin
+        self.grants = 0
+        self._token: Optional[str] = None
+        self._key: Optional[Tuple[str, Optional[str], Optional[str]]] = None
+        self._refresh_at = 0.0
+        self._lock: Optional[asyncio.Lock] = None
+        self._lock_loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _cached(self, key: Tuple[str, Optional[str], Optional[str]]) -> Optional[str]:
+        if self._token is not None and self._key == key and time.monotonic() < self._refresh_at:
+            return self._token
+        return None
+
+    def _get_lock(self) -> asyncio.Lock:
+        loop = asyncio.get_running_loop()
+        if self._lock is None or self._lock_loop is not loop:
+            self._lock = asyncio.Lock()
+            self._lock_loop = loop
+        return self._lock
+
+    async def get_token(self, client_id: Optional[str], client_secret: Optional[str]) -> str:
+        """Return a valid access token for the client. Raises HTTPException 401 on rejected credentials."""
+        key = (get_token_url(), client_id, client_secret)
+        token = self._cached(key)
+        if token is not None:
+            return token
+
+        async with self._get_lock():
+            token = self._cached(key)
+            if token is not None:
+                return token
+
+            response = await request_token({
+                "grant_type": "client_credentials",
+                "client_id": client_id,
+                "client_secret": client_secret,
+            })
+            self.grants += 1
+            if response.status_code != 200:
+                logger.warning("Keycloak rejected the client_credentials grant: %s", response.text)
+                raise HTTPException(status_code=401, detail="Invalid client credentials")
+
+            body = response.json()
+            expires_in = float(body.get("expires_in", 0))
+            self._token = body["access_token"]
+            self._key = key
+            self._refresh_at = time.monotonic() + max(expires_in - self.refresh_margin, expires_in / 2)
+            return self._token
+
+
+admin_tokens = ClientTokenManager()
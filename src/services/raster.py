@@ -0,0 +1,209 @@
+"""
+Shared raster processing module.
+
+Centralizes:
+- Vectorized point sampling of decoded raster bands
+- In-process LRU cache of decoded bands, budgeted in MB
+- Cloud-Optimized GeoTIFF encoding
+"""
+
+import logging
+import os
+import threading
+from collections import OrderedDict
+from typing import Hashable, NamedTuple, Optional, Sequence
+
+import numpy as np
+from affine import Affine
+from rasterio.io import MemoryFile
+from rasterio.shutil import copy as copy_raster
+from starlette.concurrency import run_in_threadpool
+
+from services.geoserver import BBox
+from services.geoserver_client import SingleFlight, get_async_geoserver_client
+
+# ---------- Logger ----------
+logger = logging.getLogger(__name__)
+
+# ---------- Configuration from environment ----------
+# Memory budget for decoded bands kept in process; 0 disables the cache
+DECODED_CACHE_MAX_MB = int(os.getenv("DECODED_RASTER_CACHE_MAX_MB", "256"))
+# Compression of Cloud-Optimized GeoTIFF exports (DEFLATE or ZSTD)
+COG_COMPRESSION = os.getenv("COG_COMPRESSION", "DEFLATE")
+
+# ---------- Constants ----------
+# Sentinel used by AClimate rasters for missing data, regardless of the declared nodata
+NODATA_SENTINEL = -9999
+
+# 3x3 neighbourhood offsets, in the row-major order used for the NaN fallback
+_NEIGHBOUR_ROWS = np.array([-1, -1, -1, 0, 0, 0, 1, 1, 1])
+_NEIGHBOUR_COLS = np.array([-1, 0, 1, -1, 0, 1, -1, 0, 1])
+
+
+# ---------- Point sampling ----------
+def sample_points(band: np.ndarray, transform: Affine, nodata: Optional[float],
+                  coordinates: Sequence[Sequence[float]]) -> np.ndarray:
+    """
+    Sample a single raster band at many [lon, lat] coordinates at once.
+
+    Returns a float64 array with one value per coordinate, NaN where the
+    point falls outside the raster or has no valid data. When the exact
+    pixel is NaN, the first valid pixel of its 3x3 neighbourhood is used.
+    """
+    values = np.full(len(coordinates), np.nan)
+    if not len(coordinates):
+        return values
+    coords = np.asarray(coordinates, dtype="float64")[:, :2]
+
+    height, width = band.shape
+    cols_f, rows_f = ~transform * (coords[:, 0], coords[:, 1])
+    rows = np.floor(rows_f).astype(np.int64)
+    cols = np.floor(cols_f).astype(np.int64)
+
+    inside = np.flatnonzero((rows >= 0) & (rows < height) & (cols >= 0) & (cols < width))
+    rows, cols = rows[inside], cols[inside]
+    sampled = band[rows, cols].astype("float64")
+
+    # If the exact pixel is NaN, fall back to the first valid neighbour
+    missing = np.isnan(sampled)
+    if missing.any():
+        neighbour_rows = rows[missing, None] + _NEIGHBOUR_ROWS
+        neighbour_cols = cols[missing, None] + _NEIGHBOUR_COLS
+        in_bounds = ((neighbour_rows >= 0) & (neighbour_rows < height) &
+                     (neighbour_cols >= 0) & (neighbour_cols < width))
+        neighbours = band[np.clip(neighbour_rows, 0, height - 1),
+                          np.clip(neighbour_cols, 0, width - 1)].astype("float64")
+        usable = in_bounds & ~np.isnan(neighbours) & (neighbours != NODATA_SENTINEL)
+        first_usable = usable.argmax(axis=1)
+        filled = neighbours[np.arange(len(neighbours)), first_usable]
+        sampled[missing] = np.where(usable.any(axis=1), filled, np.nan)
+
+    # Filter invalid values
+    invalid = np.isnan(sampled) | (sampled == NODATA_SENTINEL)
+    if nodata is not None:
+        invalid |= sampled == nodata
+    sampled[invalid] = np.nan
+
+    values[inside] = sampled
+    return values
+
+
+# ---------- Decoding ----------
+class DecodedRaster(NamedTuple):
+    """First band of a raster plus what is needed to sample it."""
+    band: np.ndarray
+    transform: Affine
+    nodata: Optional[float]
+
+
+def decode_raster(data: bytes) -> DecodedRaster:
+    """Decode the first band of a GeoTIFF held in memory. The band is read-only."""
+    with MemoryFile(data) as memfile:
+        with memfile.open() as raster:
+            band = raster.read(1)
+            transform, nodata = raster.transform, raster.nodata
+    band.setflags(write=False)
+    return DecodedRaster(band, transform, nodata)
+
+
+class DecodedRasterCache:
+    """
+    Thread-safe LRU cache of decoded rasters, bounded by the total
+    number of bytes held in their bands.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Hashable, DecodedRaster]" = OrderedDict()
+        self._total_bytes = 0
+
+    def get(self, key: Hashable) -> Optional[DecodedRaster]:
+        with self._lock:
+            raster = self._entries.get(key)
+            if raster is not None:
+                self._entries.move_to_end(key)
+            return raster
+
+    def put(self, key: Hashable, raster: DecodedRaster) -> None:
+        size = raster.band.nbytes
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._total_bytes -= previous.band.nbytes
+            self._entries[key] = raster
+            self._total_bytes += size
+            while self._total_bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._total_bytes -= evicted.band.nbytes
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._total_bytes = 0
+
+
+decoded_cache = DecodedRasterCache(DECODED_CACHE_MAX_MB * 1024 * 1024)
+# Downloads and decodes in flight, shared by concurrent callers
+_decodes = SingleFlight()
+
+
+async def get_decoded_raster(
+    workspace: str,
+    store: str,
+    time_subset: str,
+    bbox: Optional[BBox] = None,
+    cache: bool = False,
+) -> Optional[DecodedRaster]:
+    """
+    Return the decoded first band of a GeoServer coverage.
+
+    The download goes through the shared async GeoServer client and the
+    decode runs in the shared threadpool. With cache=True, already decoded
+    bands are served from memory and new ones are kept (and the on-disk
+    raster cache is used for the download).
+    Concurrent calls for the same coverage share one download and decode.
+    Returns None when GeoServer has no data for the request.
+    """
+    key = (workspace, store, time_subset, bbox)
+    if cache:
+        raster = decoded_cache.get(key)
+        if raster is not None:
+            return raster
+
+    return await _decodes.run(key, lambda: _download_and_decode(key, cache))
+
+
+async def _download_and_decode(key: tuple, cache: bool) -> Optional[DecodedRaster]:
+    workspace, store, time_subset, bbox = key
+    client = get_async_geoserver_client()
+    _, data = await client.download_raster(workspace, store, time_subset, bbox, cache=cache)
+    if data is None:
+        return None
+
+    raster = await run_in_threadpool(decode_raster, data)
+    if cache:
+        decoded_cache.put(key, raster)
+    return raster
+
+
+# ---------- COG encoding ----------
+def to_cog(data: bytes, compression: str = COG_COMPRESSION) -> bytes:
+    """
+    Re-encode a GeoTIFF held in memory as a Cloud-Optimized GeoTIFF:
+    512x512 tiles, internal overviews and lossless compression.
+    """
+    with MemoryFile(data) as memfile:
+        with memfile.open() as src, MemoryFile() as mem_out:
+            copy_raster(
+                src,
+                mem_out.name,
+                driver="COG",
+                compress=compression,
+                predictor="YES",
+                overviews="AUTO",
+                blocksize=512,
+            )
+            return mem_out.read()
@@ -0,0 +1,155 @@
+"""
+Persistent on-disk cache for GeoServer coverages.
+
+Centralizes:
+- Content-addressed file naming keyed by (workspace, store, time_subset, bbox)
+- Size-bounded LRU eviction
+- Reads of cached GeoTIFFs that release their file handle immediately
+"""
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Optional, Sequence
+
+# ---------- Logger ----------
+logger = logging.getLogger(__name__)
+
+# ---------- Configuration from environment ----------
+RASTER_CACHE_DIR = os.getenv(
+    "RASTER_CACHE_DIR", os.path.join(tempfile.gettempdir(), "aclimate_raster_cache")
+)
+# Maximum size of the cache directory; 0 disables the cache
+RASTER_CACHE_MAX_MB = int(os.getenv("RASTER_CACHE_MAX_MB", "1024"))
+
+# ---------- Constants ----------
+CACHE_FILE_SUFFIX = ".tif"
+
+
+class RasterDiskCache:
+    """
+    Size-bounded LRU cache of raster files on local disk.
+
+    Files are named by the SHA-256 of their key. The LRU order is rebuilt
+    from file modification times on start-up, and hits refresh the mtime
+    so the order survives restarts.
+    """
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, int]" = OrderedDict()
+        self._total_bytes = 0
+        os.makedirs(directory, exist_ok=True)
+        self._load_index()
+
+    def _load_index(self) -> None:
+        files = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(CACHE_FILE_SUFFIX):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.directory, name))
+            except OSError:
+                continue
+            files.append((stat.st_mtime, name, stat.st_size))
+        for _, name, size in sorted(files):
+            self._entries[name] = size
+            self._total_bytes += size
+        self._evict()
+
+    @staticmethod
+    def make_key(workspace: str, store: str, time_subset: str,
+                 bbox: Optional[Sequence[float]] = None) -> str:
+        """Return the cache file name for a coverage request."""
+        raw = json.dumps([workspace, store, time_subset, list(bbox) if bbox else None])
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest() + CACHE_FILE_SUFFIX
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key)
+
+    def get(self, key: str) -> Optional[bytes]:
+        """
+        Return the content of the cached file, or None on a miss. The file is
+        read and closed here, so evicting it never leaves handles open.
+        Blocking; async callers run it in the threadpool.
+        """
+        with self._lock:
+            if key not in self._entries:
+                return None
+            self._entries.move_to_end(key)
+
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            os.utime(path)
+            return data
+        except (OSError, ValueError) as e:
+            logger.warning("Dropping unreadable raster cache entry %s: %s", key, e)
+            with self._lock:
+                size = self._entries.pop(key, None)
+                if size is not None:
+                    self._total_bytes -= size
+            return None
+
+    def put(self, key: str, data: bytes) -> None:
+        """Store data under key, evicting least recently used files if needed."""
+        if not data or len(data) > self.max_bytes:
+            return
+
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".part")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, self._path(key))
+        except OSError as e:
+            logger.warning("Could not write raster cache entry %s: %s", key, e)
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            return
+
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._total_bytes -= previous
+            self._entries[key] = len(data)
+            self._total_bytes += len(data)
+            self._evict()
+
+    def _evict(self) -> None:
+        """Remove least recently used files until the cache fits. Caller holds the lock."""
+        while self._total_bytes > self.max_bytes and self._entries:
+            key, size = self._entries.popitem(last=False)
+            self._total_bytes -= size
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+
+
+_cache: Optional[RasterDiskCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_raster_cache() -> Optional[RasterDiskCache]:
+    """Return the process-wide raster cache, or None when it is disabled."""
+    global _cache
+    if RASTER_CACHE_MAX_MB <= 0:
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                try:
+                    _cache = RasterDiskCache(RASTER_CACHE_DIR, RASTER_CACHE_MAX_MB * 1024 * 1024)
+                except OSError as e:
+                    logger.error("Raster cache disabled, cannot use %s: %s", RASTER_CACHE_DIR, e)
+                    return None
+    return _cache
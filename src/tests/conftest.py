@@ -136,6 +136,36 @@ class MockClimateRecord:
         self.value = value
 
 
+class MockHistoricalDateRow:
+    """Flat row as returned by the range-bounded historical queries."""
+    def __init__(self, id, location_id, location_name, measure_id, measure_name,
+                 measure_short_name, measure_unit, date_value, value):
+        self.id = id
+        self.location_id = location_id
+        self.location_name = location_name
+        self.measure_id = measure_id
+        self.measure_name = measure_name
+        self.measure_short_name = measure_short_name
+        self.measure_unit = measure_unit
+        self.date = date_value
+        self.value = value
+
+
+class MockHistoricalMonthRow:
+    """Flat row as returned by the month range climatology query."""
+    def __init__(self, id, location_id, location_name, measure_id, measure_name,
+                 measure_short_name, measure_unit, month, value):
+        self.id = id
+        self.location_id = location_id
+        self.location_name = location_name
+        self.measure_id = measure_id
+        self.measure_name = measure_name
+        self.measure_short_name = measure_short_name
+        self.measure_unit = measure_unit
+        self.month = month
+        self.value = value
+
+
 class MockClimatologyRecord:
     def __init__(self, id, location_id, location, measure_id, measure, month, value):
         self.id = id
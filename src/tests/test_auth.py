@@ -1,30 +1,34 @@
 import os
+import httpx
 import pytest
-import requests_mock
+import respx
 from fastapi.testclient import TestClient
+from httpx import Response
 import sys
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 from main import app
 
 client = TestClient(app)
 
+TOKEN_URL = "https://keycloak.test.aclimate.org/realms/aclimate/protocol/openid-connect/token"
+
+
 @pytest.fixture
-def mock_keycloak_token_request():
-    with requests_mock.Mocker() as m:
-        url = "https://keycloak.test.aclimate.org/realms/aclimate/protocol/openid-connect/token"
-        m.post(url, json={
-            "access_token": "fake-access-token",
-            "refresh_token": "fake-refresh-token"
-        }, status_code=200)
-        yield
-
-def test_login_success(monkeypatch, mock_keycloak_token_request):
+def keycloak_env(monkeypatch):
     # Setea las variables que se usan en routers/auth.py
     monkeypatch.setenv("KEYCLOAK_URL", "https://keycloak.test.aclimate.org")
     monkeypatch.setenv("REALM_NAME", "aclimate")
     monkeypatch.setenv("CLIENT_ID", "dummy-client")
     monkeypatch.setenv("CLIENT_SECRET", "dummy-secret")
 
+
+@respx.mock
+def test_login_success(keycloak_env):
+    respx.post(TOKEN_URL).mock(return_value=Response(200, json={
+        "access_token": "fake-access-token",
+        "refresh_token": "fake-refresh-token"
+    }))
+
     response = client.post("/auth/login", json={
         "username": "demo",
         "password": "demo123"
@@ -33,3 +37,16 @@ def test_login_success(monkeypatch, mock_keycloak_token_request):
     assert response.status_code == 200
     assert "access_token" in response.json()
     assert response.json()["access_token"] == "fake-access-token"
+
+
+@respx.mock
+def test_login_keycloak_unreachable(keycloak_env):
+    respx.post(TOKEN_URL).mock(side_effect=httpx.ConnectError)
+
+    response = client.post("/auth/login", json={
+        "username": "demo",
+        "password": "demo123"
+    })
+
+    assert response.status_code == 503
+
@@ -1,29 +1,29 @@
+import json
 import pytest
 from datetime import date
-from unittest.mock import patch
+from unittest.mock import patch, MagicMock
 
-from conftest import client, MockLocation, MockMeasure, MockRecord
+from conftest import client, MockHistoricalDateRow
 
 
 @pytest.fixture
-def mock_daily_data():
-    loc = MockLocation(1, "Palmira", "EXT1", "palmira", True, None)
-    m1 = MockMeasure(1, "Precipitación", "ppt", "mm")
-    m2 = MockMeasure(2, "Temperatura", "tavg", "°C")
-
+def mock_daily_rows():
     return [
-        MockRecord(1, 1, loc, 1, m1, date(2025, 5, 3), 10.0),
-        MockRecord(2, 1, loc, 2, m2, date(2025, 5, 12), 28.5),
-        MockRecord(3, 1, loc, 1, m1, date(2025, 6, 1), 15.0),
+        MockHistoricalDateRow(1, 1, "Palmira", 1, "Precipitación", "ppt", "mm", date(2025, 5, 3), 10.0),
+        MockHistoricalDateRow(2, 1, "Palmira", 2, "Temperatura", "tavg", "°C", date(2025, 5, 12), 28.5),
     ]
 
 
-def test_get_by_date_range_all_measures(mock_daily_data):
-    with patch("aclimate_v3_orm.services.climate_historical_daily_service.ClimateHistoricalDailyService.get_by_location_id", return_value=mock_daily_data):
+def test_get_by_date_range_all_measures(mock_daily_rows):
+    with patch("services.climate_historical.SessionLocal") as mock_session_local:
+        mock_session = MagicMock()
+        mock_session_local.return_value = mock_session
+        mock_session.execute.return_value.all.return_value = mock_daily_rows
+
         response = client.get(
             "/historical-daily/by-date-range-all-measures",
             params={
-                "location_ids": "1",
+                "location_ids": "1,2",
                 "start_date": "2025-05-01",
                 "end_date": "2025-05-26"
             }
@@ -46,5 +46,84 @@ def test_get_by_date_range_all_measures(mock_daily_data):
             assert "date" in record
             assert "value" in record
 
-        dates = [r["date"] for r in data]
-        assert "2025-06-01" not in dates
\ No newline at end of file
+        assert data[0]["location_name"] == "Palmira"
+        assert data[1]["measure_short_name"] == "tavg"
+
+        # One round trip, with the location and date filters pushed into SQL
+        mock_session.execute.assert_called_once()
+        stmt = mock_session.execute.call_args[0][0]
+        sql = str(stmt.compile(compile_kwargs={"literal_binds": True}))
+        assert "IN (1, 2)" in sql
+        assert "BETWEEN '2025-05-01' AND '2025-05-26'" in sql
+        mock_session.close.assert_called_once()
+
+
+def test_get_by_date_range_all_measures_columnar(mock_daily_rows):
+    with patch("services.climate_historical.SessionLocal") as mock_session_local:
+        mock_session = MagicMock()
+        mock_session_local.return_value = mock_session
+        mock_session.execute.return_value.all.return_value = mock_daily_rows
+
+        response = client.get(
+            "/historical-daily/by-date-range-all-measures",
+            params={
+                "location_ids": "1",
+                "start_date": "2025-05-01",
+                "end_date": "2025-05-26",
+                "format": "columnar"
+            }
+        )
+
+        assert response.status_code == 200
+        data = response.json()
+
+        assert data["locations"] == [{"id": 1, "name": "Palmira"}]
+        assert [m["short_name"] for m in data["measures"]] == ["ppt", "tavg"]
+        assert data["location_index"] == [0, 0]
+        assert data["measure_index"] == [0, 1]
+        assert data["dates"] == ["2025-05-03", "2025-05-12"]
+        assert data["values"] == [10.0, 28.5]
+
+
+def test_get_by_date_range_all_measures_streams_ndjson(mock_daily_rows):
+    with patch("services.climate_historical.SessionLocal") as mock_session_local:
+        mock_session = MagicMock()
+        mock_session_local.return_value = mock_session
+        mock_session.execute.return_value.partitions.return_value = [mock_daily_rows[:1], mock_daily_rows[1:]]
+
+        response = client.get(
+            "/historical-daily/by-date-range-all-measures",
+            params={"location_ids": "1", "start_date": "2025-05-01", "end_date": "2025-05-26"},
+            headers={"Accept": "application/x-ndjson"}
+        )
+
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("application/x-ndjson")
+        lines = [json.loads(line) for line in response.text.splitlines()]
+        assert [line["date"] for line in lines] == ["2025-05-03", "2025-05-12"]
+        assert lines[0]["location_name"] == "Palmira"
+
+        # Rows come from a server-side cursor instead of a fully loaded list
+        stmt = mock_session.execute.call_args[0][0]
+        assert stmt.get_execution_options()["stream_results"] is True
+        mock_session.execute.return_value.all.assert_not_called()
+        mock_session.close.assert_called_once()
+
+
+def test_get_by_date_range_all_measures_streams_csv(mock_daily_rows):
+    with patch("services.climate_historical.SessionLocal") as mock_session_local:
+        mock_session = MagicMock()
+        mock_session_local.return_value = mock_session
+        mock_session.execute.return_value.partitions.return_value = [mock_daily_rows]
+
+        response = client.get(
+            "/historical-daily/by-date-range-all-measures",
+            params={"location_ids": "1", "start_date": "2025-05-01", "end_date": "2025-05-26"},
+            headers={"Accept": "text/csv"}
+        )
+
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/csv")
+        lines = response.text.splitlines()
+        assert lines[0] == "id,location_id,location_name,measure_id,measure_name,measure_short_name,measure_unit,date,value"
+        assert len(lines) == 3
@@ -1,45 +1,29 @@
 import pytest
-from unittest.mock import patch
+from unittest.mock import patch, MagicMock
 
-from conftest import client, MockClimatologyRecord
+from conftest import client, MockHistoricalMonthRow
 
 
 @pytest.fixture
-def mock_climatology_data():
-    class Measure:
-        def __init__(self, id, name, short_name, unit):
-            self.id = id
-            self.name = name
-            self.short_name = short_name
-            self.unit = unit
-
-    class Location:
-        def __init__(self, id, name):
-            self.id = id
-            self.name = name
-
-    location1 = Location(1, "Palmira")
-    location2 = Location(2, "Cali")
-    measure1 = Measure(10, "Precipitación", "prec", "mm")
-    measure2 = Measure(11, "Temperatura", "temp", "°C")
-
-    return {
-        1: [
-            MockClimatologyRecord(101, 1, location1, 10, measure1, 3, 123.4),
-            MockClimatologyRecord(102, 1, location1, 11, measure2, 4, 26.1),
-        ],
-        2: [
-            MockClimatologyRecord(201, 2, location2, 10, measure1, 5, 111.0),
-            MockClimatologyRecord(202, 2, location2, 11, measure2, 6, 28.0),
-        ]
-    }
-
-
-def test_get_climatology_by_month_range_location_ids_all_measures(mock_climatology_data):
-    def mock_get_by_location_id(loc_id):
-        return mock_climatology_data.get(loc_id, [])
-
-    with patch("aclimate_v3_orm.services.climate_historical_climatology_service.ClimateHistoricalClimatologyService.get_by_location_id", side_effect=mock_get_by_location_id):
+def mock_climatology_rows():
+    return [
+        MockHistoricalMonthRow(101, 1, "Palmira", 10, "Precipitación", "prec", "mm", 3, 123.4),
+        MockHistoricalMonthRow(102, 1, "Palmira", 11, "Temperatura", "temp", "°C", 4, 26.1),
+        MockHistoricalMonthRow(201, 2, "Cali", 10, "Precipitación", "prec", "mm", 5, 111.0),
+    ]
+
+
+def _mock_session(mock_session_local, rows):
+    mock_session = MagicMock()
+    mock_session_local.return_value = mock_session
+    mock_session.execute.return_value.all.return_value = rows
+    return mock_session
+
+
+def test_get_climatology_by_month_range_location_ids_all_measures(mock_climatology_rows):
+    with patch("services.climate_historical.SessionLocal") as mock_session_local:
+        mock_session = _mock_session(mock_session_local, mock_climatology_rows)
+
         response = client.get(
             "/climatology/by-month-range-location-ids-all-measures",
             params={"location_ids": "1,2", "start_month": 3, "end_month": 5}
@@ -49,4 +33,80 @@ def test_get_climatology_by_month_range_location_ids_all_measures(mock_climatolo
         assert isinstance(data, list)
         assert all("location_id" in d for d in data)
         assert all(3 <= d["month"] <= 5 for d in data)
-        assert {d["location_id"] for d in data} == {1, 2}
\ No newline at end of file
+        assert {d["location_id"] for d in data} == {1, 2}
+
+        # All locations are resolved in a single query
+        mock_session.execute.assert_called_once()
+        sql = str(mock_session.execute.call_args[0][0].compile(compile_kwargs={"literal_binds": True}))
+        assert "IN (1, 2)" in sql
+        assert "BETWEEN 3 AND 5" in sql
+
+
+def test_get_climatology_by_month_range_wraps_year_end():
+    rows = [
+        MockHistoricalMonthRow(111, 1, "Palmira", 10, "Precipitación", "prec", "mm", 11, 150.0),
+        MockHistoricalMonthRow(101, 1, "Palmira", 10, "Precipitación", "prec", "mm", 1, 80.0),
+    ]
+    with patch("services.climate_historical.SessionLocal") as mock_session_local:
+        mock_session = _mock_session(mock_session_local, rows)
+
+        response = client.get(
+            "/climatology/by-month-range-location-ids-all-measures",
+            params={"location_ids": "1", "start_month": 11, "end_month": 2}
+        )
+        assert response.status_code == 200
+        assert [d["month"] for d in response.json()] == [11, 1]
+
+        sql = str(mock_session.execute.call_args[0][0].compile(compile_kwargs={"literal_binds": True}))
+        assert ">= 11" in sql
+        assert "<= 2" in sql
+
+
+def test_get_climatology_by_month_range_invalid_month():
+    response = client.get(
+        "/climatology/by-month-range-location-ids-all-measures",
+        params={"location_ids": "1", "start_month": 0, "end_month": 13}
+    )
+    assert response.status_code == 422
+
+
+def test_get_climatology_by_month_range_columnar(mock_climatology_rows):
+    with patch("services.climate_historical.SessionLocal") as mock_session_local:
+        _mock_session(mock_session_local, mock_climatology_rows)
+
+        response = client.get(
+            "/climatology/by-month-range-location-ids-all-measures",
+            params={"location_ids": "1,2", "start_month": 3, "end_month": 5, "format": "columnar"}
+        )
+        assert response.status_code == 200
+        data = response.json()
+        assert [loc["id"] for loc in data["locations"]] == [1, 2]
+        assert len(data["measures"]) == 2
+        assert data["location_index"] == [0, 0, 1]
+        assert data["measure_index"] == [0, 1, 0]
+        assert data["months"] == [3, 4, 5]
+        assert len(data["values"]) == 3
+
+
+def test_get_climatology_by_month_range_streams_csv(mock_climatology_rows):
+    with patch("services.climate_historical.SessionLocal") as mock_session_local:
+        mock_session = MagicMock()
+        mock_session_local.return_value = mock_session
+        mock_session.execute.return_value.partitions.return_value = [mock_climatology_rows[:2], mock_climatology_rows[2:]]
+
+        response = client.get(
+            "/climatology/by-month-range-location-ids-all-measures",
+            params={"location_ids": "1,2", "start_month": 3, "end_month": 5},
+            headers={"Accept": "text/csv"}
+        )
+
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/csv")
+        lines = response.text.splitlines()
+        assert lines[0] == "id,location_id,location_name,measure_id,measure_name,measure_short_name,measure_unit,month,value"
+        assert len(lines) == 4
+        assert lines[3].split(",")[2] == "Cali"
+
+        stmt = mock_session.execute.call_args[0][0]
+        assert stmt.get_execution_options()["stream_results"] is True
+        mock_session.execute.return_value.all.assert_not_called()
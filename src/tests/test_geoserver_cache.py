@@ -0,0 +1,167 @@
+import asyncio
+import os
+from datetime import date, timedelta
+from unittest.mock import patch, AsyncMock, MagicMock
+
+import numpy as np
+import pytest
+import respx
+from affine import Affine
+from httpx import Response
+
+from concurrent.futures import ThreadPoolExecutor
+
+from services.geoserver import (
+    close_geoserver_session,
+    generate_date_list,
+    get_geoserver_session,
+    get_session_pool_stats,
+)
+from services.geoserver_client import AsyncGeoServerClient
+from services.raster import DecodedRaster, DecodedRasterCache, decoded_cache, get_decoded_raster
+from services.raster_cache import RasterDiskCache
+
+TIME_SUBSET = 'Time("2024-01-01T00:00:00.000Z")'
+
+
+def test_disk_cache_roundtrip(tmp_path):
+    cache = RasterDiskCache(str(tmp_path), max_bytes=1024)
+    key = RasterDiskCache.make_key("aclimate", "precipitation", TIME_SUBSET, (-76.0, 3.0, -74.0, 5.0))
+
+    assert cache.get(key) is None
+    cache.put(key, b"tiff-bytes")
+
+    assert cache.get(key) == b"tiff-bytes"
+    assert key != RasterDiskCache.make_key("aclimate", "precipitation", TIME_SUBSET)
+
+
+def test_disk_cache_evicts_least_recently_used(tmp_path):
+    cache = RasterDiskCache(str(tmp_path), max_bytes=25)
+    cache.put("a.tif", b"x" * 10)
+    cache.put("b.tif", b"x" * 10)
+    cache.get("a.tif")
+    cache.put("c.tif", b"x" * 10)
+
+    assert cache.get("b.tif") is None
+    assert cache.get("a.tif") is not None
+    assert cache.get("c.tif") is not None
+    assert sorted(os.listdir(tmp_path)) == ["a.tif", "c.tif"]
+
+
+def test_disk_cache_reloads_index(tmp_path):
+    RasterDiskCache(str(tmp_path), max_bytes=100).put("a.tif", b"data")
+    assert RasterDiskCache(str(tmp_path), max_bytes=100).get("a.tif") == b"data"
+
+
+def test_generate_date_list_marks_elapsed_periods_cacheable():
+    today = date.today()
+    dates = generate_date_list(today - timedelta(days=1), today, "daily")
+    assert [d["cacheable"] for d in dates] == [True, False]
+
+
+@respx.mock
+def test_download_raster_uses_disk_cache(tmp_path):
+    cache = RasterDiskCache(str(tmp_path), max_bytes=1024)
+    route = respx.get(url__regex=r".*/aclimate/ows\?.*").mock(
+        return_value=Response(200, content=b"tiff-bytes", headers={"Content-Type": "image/tiff"})
+    )
+
+    async def download_twice():
+        geoserver = AsyncGeoServerClient()
+        try:
+            first = await geoserver.download_raster("aclimate", "precipitation", TIME_SUBSET, cache=True)
+            second = await geoserver.download_raster("aclimate", "precipitation", TIME_SUBSET, cache=True)
+            return first[1], second[1]
+        finally:
+            await geoserver.aclose()
+
+    with patch("services.geoserver_client.get_raster_cache", return_value=cache):
+        first, second = asyncio.run(download_twice())
+
+    assert first == b"tiff-bytes"
+    assert second == b"tiff-bytes"
+    assert route.call_count == 1
+
+
+def test_geoserver_session_is_shared_across_threads():
+    close_geoserver_session()
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        first = list(executor.map(lambda _: get_geoserver_session(), range(8)))
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        second = list(executor.map(lambda _: get_geoserver_session(), range(8)))
+    assert all(session is first[0] for session in first + second)
+
+    close_geoserver_session()
+    assert get_geoserver_session() is not first[0]
+    assert get_session_pool_stats() == {"requests": 0, "hits": 0, "misses": 0}
+
+
+def _decoded(n_bytes):
+    return DecodedRaster(np.zeros(n_bytes, dtype="uint8"), Affine.identity(), None)
+
+
+def test_decoded_cache_is_bounded_by_bytes():
+    cache = DecodedRasterCache(max_bytes=250)
+    cache.put("a", _decoded(100))
+    cache.put("b", _decoded(100))
+    cache.get("a")
+    cache.put("c", _decoded(100))
+
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    assert cache.get("c") is not None
+    cache.put("huge", _decoded(1000))
+    assert cache.get("huge") is None
+
+
+@pytest.fixture
+def geotiff_bytes():
+    from rasterio.io import MemoryFile
+    from rasterio.transform import from_origin
+
+    with MemoryFile() as memfile:
+        with memfile.open(driver="GTiff", width=2, height=2, count=1, dtype="float32",
+                          crs="EPSG:4326", transform=from_origin(0, 2, 1, 1)) as dst:
+            dst.write(np.ones((2, 2), dtype="float32"), 1)
+        return memfile.read()
+
+
+def test_get_decoded_raster_decodes_once(geotiff_bytes):
+    decoded_cache.clear()
+    mock_client = MagicMock()
+    mock_client.download_raster = AsyncMock(return_value=(TIME_SUBSET, geotiff_bytes))
+
+    async def fetch_three_times():
+        first = await get_decoded_raster("aclimate", "precipitation", TIME_SUBSET, cache=True)
+        second = await get_decoded_raster("aclimate", "precipitation", TIME_SUBSET, cache=True)
+        await get_decoded_raster("aclimate", "precipitation", TIME_SUBSET, cache=False)
+        return first, second
+
+    with patch("services.raster.get_async_geoserver_client", return_value=mock_client):
+        first, second = asyncio.run(fetch_three_times())
+
+    assert first is second
+    assert not first.band.flags.writeable
+    assert mock_client.download_raster.await_count == 2
+    decoded_cache.clear()
+
+
+def test_get_decoded_raster_coalesces_concurrent_calls(geotiff_bytes):
+    decoded_cache.clear()
+    mock_client = MagicMock()
+
+    async def slow_download(*args, **kwargs):
+        await asyncio.sleep(0.01)
+        return TIME_SUBSET, geotiff_bytes
+    mock_client.download_raster = AsyncMock(side_effect=slow_download)
+
+    async def fetch_concurrently():
+        return await asyncio.gather(*(
+            get_decoded_raster("aclimate", "precipitation", TIME_SUBSET) for _ in range(5)
+        ))
+
+    with patch("services.raster.get_async_geoserver_client", return_value=mock_client):
+        rasters = asyncio.run(fetch_concurrently())
+
+    assert all(raster is rasters[0] for raster in rasters)
+    assert mock_client.download_raster.await_count == 1
@@ -0,0 +1,127 @@
+import asyncio
+from unittest.mock import patch
+
+import pytest
+
+from services.geoserver_client import AsyncGeoServerClient
+from services.geoserver_governor import ConcurrencyGovernor, GeoServerUnavailable
+
+
+def _run(governor, statuses, latency=0.0):
+    async def request(status):
+        async with governor.slot() as outcome:
+            if status is None:
+                outcome.transport_error()
+            else:
+                outcome.response(status)
+
+    async def run():
+        for status in statuses:
+            await request(status)
+
+    with patch("services.geoserver_governor.time.monotonic", side_effect=_clock(latency)):
+        asyncio.run(run())
+
+
+def _clock(step):
+    now = [0.0]
+
+    def monotonic():
+        now[0] += step
+        return now[0]
+    return monotonic
+
+
+def test_governor_grows_on_fast_success():
+    governor = ConcurrencyGovernor(initial=4, maximum=8)
+    _run(governor, [200] * 20)
+    assert governor.limit > 6
+    assert governor.stats()["breaker"] == "closed"
+
+
+def test_governor_halves_once_per_window_on_overload():
+    governor = ConcurrencyGovernor(initial=8, breaker_threshold=100)
+    _run(governor, [503, 429, 503])
+    assert governor.limit == 4
+    assert governor.overloads == 3
+
+
+def test_governor_shrinks_on_slow_responses():
+    governor = ConcurrencyGovernor(initial=8, target_latency=1.0)
+    _run(governor, [200], latency=5.0)
+    assert governor.limit == pytest.approx(7.2)
+
+
+def test_governor_circuit_breaker():
+    governor = ConcurrencyGovernor(breaker_threshold=3, breaker_cooldown=60)
+    _run(governor, [502, 503, None])
+    assert governor.breaker == "open"
+
+    # Fails fast during the cooldown
+    with pytest.raises(GeoServerUnavailable):
+        _run(governor, [200])
+
+    # After the cooldown a successful probe closes the circuit
+    governor._opened_at -= 60
+    _run(governor, [200])
+    assert governor.breaker == "closed"
+
+
+def test_governor_limits_in_flight_requests():
+    governor = ConcurrencyGovernor(initial=2, maximum=2)
+    peak = 0
+
+    async def request():
+        nonlocal peak
+        async with governor.slot() as outcome:
+            peak = max(peak, governor.in_flight)
+            await asyncio.sleep(0.01)
+            outcome.response(200)
+
+    async def run():
+        await asyncio.gather(*(request() for _ in range(6)))
+
+    asyncio.run(run())
+    assert peak == 2
+
+
+def test_governor_ignores_cancelled_and_unreported_requests():
+    governor = ConcurrencyGovernor(initial=4, breaker_threshold=2)
+
+    async def cancelled():
+        async with governor.slot():
+            await asyncio.sleep(10)
+
+    async def unreported():
+        async with governor.slot():
+            raise ValueError("failed before reaching GeoServer")
+
+    async def run():
+        tasks = [asyncio.create_task(cancelled()) for _ in range(4)]
+        await asyncio.sleep(0)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        for _ in range(3):
+            with pytest.raises(ValueError):
+                await unreported()
+
+    asyncio.run(run())
+    # Client disconnects neither shrink the window nor open the circuit
+    assert governor.limit == 4
+    assert governor.in_flight == 0
+    assert governor.requests == 0
+    assert governor.breaker == "closed"
+
+
+def test_client_governor_never_outgrows_the_connection_pool():
+    async def run():
+        geoserver = AsyncGeoServerClient(max_connections=4)
+        try:
+            return geoserver.governor
+        finally:
+            await geoserver.aclose()
+
+    governor = asyncio.run(run())
+    assert governor.maximum == 4
+    assert governor.limit <= 4
@@ -0,0 +1,214 @@
+import asyncio
+
+import numpy as np
+import pytest
+import respx
+from httpx import Response
+from unittest.mock import patch
+from rasterio.io import MemoryFile
+from rasterio.transform import from_origin
+
+from conftest import client
+from services.geoserver import build_wcs_url, get_coordinates_bbox
+from services.geoserver_client import AsyncGeoServerClient
+from services.geoserver_governor import GeoServerUnavailable
+from services.raster import decoded_cache, sample_points
+
+# 4x4 grid of 1-degree pixels covering lon -76..-72, lat 2..6
+TRANSFORM = from_origin(-76.0, 6.0, 1.0, 1.0)
+
+
+@pytest.fixture(autouse=True)
+def clear_caches():
+    decoded_cache.clear()
+    with patch("services.geoserver_client.get_raster_cache", return_value=None):
+        yield
+    decoded_cache.clear()
+
+
+@pytest.fixture
+def band():
+    data = np.arange(16, dtype="float32").reshape(4, 4)
+    data[1, 1] = np.nan
+    data[3, 3] = -9999
+    return data
+
+
+def _geotiff_bytes(data, nodata=None):
+    with MemoryFile() as memfile:
+        with memfile.open(driver="GTiff", width=data.shape[1], height=data.shape[0], count=1,
+                          dtype=data.dtype, crs="EPSG:4326", transform=TRANSFORM, nodata=nodata) as dst:
+            dst.write(data, 1)
+        return memfile.read()
+
+
+def test_sample_points_exact_pixels(band):
+    values = sample_points(band, TRANSFORM, None, [[-75.5, 5.5], [-72.5, 2.5 + 1.0]])
+    assert values.tolist() == [0.0, 11.0]
+
+
+def test_sample_points_outside_and_invalid(band):
+    values = sample_points(band, TRANSFORM, 2.0, [[-80.0, 5.5], [-72.5, 2.5], [-73.5, 5.5]])
+    # Outside the raster, the -9999 sentinel and the declared nodata are all dropped
+    assert np.isnan(values).all()
+
+
+def test_sample_points_nan_uses_first_valid_neighbour(band):
+    values = sample_points(band, TRANSFORM, None, [[-74.5, 4.5]])
+    # Pixel (1, 1) is NaN; the first neighbour in row-major order is (0, 0)
+    assert values.tolist() == [0.0]
+
+
+def test_sample_points_empty(band):
+    assert sample_points(band, TRANSFORM, None, []).size == 0
+
+
+def test_build_wcs_url_with_bbox():
+    bbox = get_coordinates_bbox([[-75.5, 5.5], [-74.0, 4.0]], padding=0.5)
+    assert bbox == (-76.0, 3.5, -73.5, 6.0)
+
+    url = build_wcs_url("aclimate", "precipitation", 'Time("2024-01-01T00:00:00.000Z")', bbox)
+    assert "subset=Long%28-76.0%2C-73.5%29" in url
+    assert "subset=Lat%283.5%2C6.0%29" in url
+    assert "subset=Long" not in build_wcs_url("aclimate", "precipitation", 'Time("2024-01-01T00:00:00.000Z")')
+
+
+@respx.mock
+def test_point_data(band):
+    raster_bytes = _geotiff_bytes(band)
+    route = respx.get(url__regex=r".*/aclimate/ows\?.*").mock(
+        return_value=Response(200, content=raster_bytes, headers={"Content-Type": "image/tiff"})
+    )
+    with patch("routes.get_geoserver_point_data.get_geoserver_auth"):
+        response = client.post("/geoserver/point-data", json={
+            "coordinates": [[-75.5, 5.5], [-80.0, 5.5]],
+            "start_date": "2024-01-01",
+            "end_date": "2024-01-02",
+            "workspace": "aclimate",
+            "store": "precipitation",
+            "temporality": "daily"
+        })
+    assert response.status_code == 200
+    data = response.json()
+    assert data["total_results"] == 2
+    assert [r["date"] for r in data["data"]] == ["2024-01-01", "2024-01-02"]
+    assert all(r["coordinate"] == [-75.5, 5.5] and r["value"] == 0.0 for r in data["data"])
+
+    # One GeoServer call per date, each only for the window around the coordinates
+    assert route.call_count == 2
+    subsets = route.calls[0].request.url.params.get_list("subset")
+    assert any(s.startswith("Long(") for s in subsets)
+    assert any(s.startswith("Lat(") for s in subsets)
+
+
+@respx.mock
+def test_point_data_missing_date(band):
+    raster_bytes = _geotiff_bytes(band)
+    respx.get(url__regex=r".*Time%28%222024-01-01.*").mock(
+        return_value=Response(200, content=raster_bytes, headers={"Content-Type": "image/tiff"})
+    )
+    respx.get(url__regex=r".*Time%28%222024-01-02.*").mock(return_value=Response(404))
+    with patch("routes.get_geoserver_point_data.get_geoserver_auth"):
+        response = client.post("/geoserver/point-data", json={
+            "coordinates": [[-75.5, 5.5]],
+            "start_date": "2024-01-01",
+            "end_date": "2024-01-02",
+            "workspace": "aclimate",
+            "store": "precipitation",
+        })
+    assert response.status_code == 200
+    assert [r["date"] for r in response.json()["data"]] == ["2024-01-01"]
+
+
+@respx.mock
+def test_point_timeseries(band):
+    raster_bytes = _geotiff_bytes(band)
+    respx.get(url__regex=r".*Time%28%222024-01-0[12].*").mock(
+        return_value=Response(200, content=raster_bytes, headers={"Content-Type": "image/tiff"})
+    )
+    route = respx.get(url__regex=r".*Time%28%222024-01-03.*").mock(return_value=Response(404))
+    # Small batches: at most two windows are downloaded at a time
+    with patch("routes.get_geoserver_point_data.get_geoserver_auth"), \
+         patch("routes.get_geoserver_point_data.POINT_TIMESERIES_BATCH_SIZE", 2):
+        response = client.post("/geoserver/point-timeseries", json={
+            # Two neighbouring points share a window, the third gets its own
+            "coordinates": [[-75.5, 5.5], [-75.4, 5.6], [-72.5, 2.5]],
+            "start_date": "2024-01-01",
+            "end_date": "2024-01-03",
+            "workspace": "aclimate",
+            "store": "precipitation",
+        })
+    assert response.status_code == 200
+    data = response.json()
+    assert data["dates"] == ["2024-01-01", "2024-01-02", "2024-01-03"]
+    assert [s["values"] for s in data["series"]] == [[0.0, 0.0, None], [0.0, 0.0, None], [None, None, None]]
+    assert respx.calls.call_count == 6
+    assert route.call_count == 2
+
+
+@respx.mock
+def test_point_timeseries_caps_windows_per_date(band):
+    route = respx.get(url__regex=r".*/aclimate/ows\?.*").mock(
+        return_value=Response(200, content=_geotiff_bytes(band), headers={"Content-Type": "image/tiff"})
+    )
+    with patch("routes.get_geoserver_point_data.get_geoserver_auth"), \
+         patch("routes.get_geoserver_point_data.POINT_TIMESERIES_MAX_WINDOWS", 2):
+        response = client.post("/geoserver/point-timeseries", json={
+            # Three far-apart points would need three windows per date
+            "coordinates": [[-75.5, 5.5], [-72.5, 2.5], [-73.5, 4.5]],
+            "start_date": "2024-01-01",
+            "end_date": "2024-01-02",
+            "workspace": "aclimate",
+            "store": "precipitation",
+        })
+    assert response.status_code == 200
+    assert route.call_count == 2
+    assert "Long%28-75.6%2C-72.4%29" in str(route.calls[0].request.url)
+    assert [s["values"] for s in response.json()["series"]] == [[0.0, 0.0], [None, None], [6.0, 6.0]]
+
+
+def test_point_timeseries_rejects_too_many_dates():
+    response = client.post("/geoserver/point-timeseries", json={
+        "coordinates": [[-75.5, 5.5]],
+        "start_date": "2020-01-01",
+        "end_date": "2024-12-31",
+        "workspace": "aclimate",
+        "store": "precipitation",
+    })
+    assert response.status_code == 400
+    assert "Maximum 366 dates" in response.json()["detail"]
+
+
+@respx.mock
+def test_async_client_coalesces_identical_downloads(band):
+    route = respx.get(url__regex=r".*/aclimate/ows\?.*").mock(
+        return_value=Response(200, content=_geotiff_bytes(band), headers={"Content-Type": "image/tiff"})
+    )
+    time_subset = 'Time("2024-01-01T00:00:00.000Z")'
+
+    async def download_concurrently():
+        geoserver = AsyncGeoServerClient()
+        try:
+            results = await asyncio.gather(*(
+                geoserver.download_raster("aclimate", "precipitation", time_subset) for _ in range(5)
+            ))
+            return results, geoserver.coalesced()
+        finally:
+            await geoserver.aclose()
+
+    results, coalesced = asyncio.run(download_concurrently())
+    assert route.call_count == 1
+    assert coalesced == 4
+    assert all(content == results[0][1] for _, content in results)
+
+
+def test_point_timeseries_returns_503_while_geoserver_is_unavailable():
+    with patch("routes.get_geoserver_point_data.get_geoserver_auth"), \
+         patch("routes.get_geoserver_point_data.get_decoded_raster", side_effect=GeoServerUnavailable()):
+        response = client.post("/geoserver/point-timeseries", json={
+            "coordinates": [[-75.5, 5.5]],
+            "start_date": "2024-01-01",
+            "workspace": "aclimate",
+            "store": "precipitation",
+        })
+    assert response.status_code == 503
@@ -0,0 +1,368 @@
+import asyncio
+import io
+import os
+import time
+import zipfile
+from datetime import date
+from unittest.mock import MagicMock, patch
+
+import netCDF4
+import numpy as np
+import pytest
+import respx
+from httpx import Response
+from rasterio.features import geometry_mask
+from rasterio.io import DatasetReader, MemoryFile
+from rasterio.transform import from_origin
+from rasterio.windows import Window
+
+from conftest import client
+from dependencies.auth_dependencies import get_current_user
+from routes.get_geoserver_raster import clip_raster, iter_date_results
+from schemas.geoserver import ClipConfig
+from services.clip import ClipGeometryCache, geometry_cache, mask_cache
+from services.export_jobs import ExportJobManager
+from services.geoserver_governor import GeoServerUnavailable
+from services.geoserver import generate_date_list
+
+RASTER_URL = r".*/aclimate/ows\?.*Time%28%22{date}.*"
+
+
+@pytest.fixture(autouse=True)
+def no_disk_cache():
+    with patch("services.geoserver_client.get_raster_cache", return_value=None), \
+         patch("routes.get_geoserver_raster.get_geoserver_auth"):
+        yield
+
+
+def _mock_date(date_str, content=None):
+    response = Response(200, content=content, headers={"Content-Type": "image/tiff"}) if content else Response(404)
+    return respx.get(url__regex=RASTER_URL.format(date=date_str)).mock(return_value=response)
+
+
+def _export(**overrides):
+    payload = {
+        "workspace": "aclimate",
+        "store": "precipitation",
+        "start_date": "2024-01-01",
+        "end_date": "2024-01-03",
+        "temporality": "daily",
+        "output_format": "zip",
+    }
+    payload.update(overrides)
+    return client.post("/geoserver/raster-export", json=payload)
+
+
+@respx.mock
+def test_raster_export_zip_in_date_order():
+    _mock_date("2024-01-01", b"tif-1")
+    _mock_date("2024-01-02")
+    _mock_date("2024-01-03", b"tif-3")
+
+    response = _export()
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/zip"
+
+    archive = zipfile.ZipFile(io.BytesIO(response.content))
+    assert archive.namelist() == ["2024-01-01.tif", "2024-01-03.tif"]
+    assert archive.read("2024-01-03.tif") == b"tif-3"
+
+
+@respx.mock
+def test_raster_export_single_tiff():
+    _mock_date("2024-01-01", b"tif-1")
+
+    response = _export(end_date="2024-01-01", output_format="single_tiff")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "image/tiff"
+    assert response.content == b"tif-1"
+
+
+@respx.mock
+def test_raster_export_no_data():
+    for day in ("2024-01-01", "2024-01-02", "2024-01-03"):
+        _mock_date(day)
+
+    response = _export()
+    assert response.status_code == 404
+
+
+@respx.mock
+def test_raster_export_bounded_lookahead():
+    for day in range(1, 8):
+        _mock_date(f"2024-01-0{day}", f"tif-{day}".encode())
+
+    async def consume():
+        results = iter_date_results(generate_date_list(date(2024, 1, 1), date(2024, 1, 7), "daily"),
+                                    "aclimate", "precipitation", None, lookahead=2)
+        first = await anext(results)
+        calls = respx.calls.call_count
+        rest = [item async for item in results]
+        return first, calls, rest
+
+    first, calls_after_first, rest = asyncio.run(consume())
+    assert first == ("2024-01-01", b"tif-1")
+    assert calls_after_first <= 2
+    assert [date_str for date_str, _ in rest] == [f"2024-01-0{day}" for day in range(2, 8)]
+
+
+def _wait_for_job(job_id, timeout=5):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = client.get(f"/geoserver/raster-export/jobs/{job_id}").json()
+        if job["status"] in ("completed", "failed"):
+            return job
+        time.sleep(0.05)
+    raise AssertionError("export job did not finish")
+
+
+@respx.mock
+def test_raster_export_job(tmp_path):
+    for day in range(1, 10):
+        _mock_date(f"2024-01-0{day}", f"tif-{day}".encode())
+    manager = ExportJobManager(directory=str(tmp_path), workers=1)
+
+    with patch("routes.get_geoserver_raster.export_jobs", manager), client:
+        # More dates than the synchronous limit
+        assert _export(end_date="2024-01-09").status_code == 400
+        response = _export(end_date="2024-01-09", mode="job")
+        assert response.status_code == 202
+        job_id = response.json()["job_id"]
+
+        job = _wait_for_job(job_id)
+        assert job["status"] == "completed"
+        assert job["progress"] == 1.0
+        assert job["files_written"] == 9
+
+        download = client.get(f"/geoserver/raster-export/jobs/{job_id}/download")
+        assert download.status_code == 200
+        archive = zipfile.ZipFile(io.BytesIO(download.content))
+        assert archive.namelist() == [f"2024-01-0{day}.tif" for day in range(1, 10)]
+
+    assert client.get("/geoserver/raster-export/jobs/unknown").status_code == 404
+
+    # Jobs are only visible to the user who started them
+    client.app.dependency_overrides[get_current_user] = lambda: {"sub": "another-user"}
+    assert client.get(f"/geoserver/raster-export/jobs/{job_id}").status_code == 404
+    assert client.get(f"/geoserver/raster-export/jobs/{job_id}/download").status_code == 404
+
+
+@respx.mock
+def test_raster_export_job_without_data(tmp_path):
+    _mock_date("2024-01-01")
+    manager = ExportJobManager(directory=str(tmp_path), workers=1)
+
+    with patch("routes.get_geoserver_raster.export_jobs", manager), client:
+        job_id = _export(end_date="2024-01-01", mode="job").json()["job_id"]
+        job = _wait_for_job(job_id)
+        assert job["status"] == "failed"
+        assert client.get(f"/geoserver/raster-export/jobs/{job_id}/download").status_code == 409
+
+
+@respx.mock
+def test_expired_export_jobs_are_removed_without_new_submissions(tmp_path):
+    _mock_date("2024-01-01", b"tif-1")
+    manager = ExportJobManager(directory=str(tmp_path), workers=1, ttl_seconds=0, cleanup_seconds=0.05)
+
+    with patch("routes.get_geoserver_raster.export_jobs", manager), client:
+        job_id = _export(end_date="2024-01-01", mode="job").json()["job_id"]
+        deadline = time.monotonic() + 5
+        while client.get(f"/geoserver/raster-export/jobs/{job_id}").status_code == 200 \
+                and time.monotonic() < deadline:
+            time.sleep(0.05)
+        assert client.get(f"/geoserver/raster-export/jobs/{job_id}").status_code == 404
+
+    assert list(tmp_path.iterdir()) == []
+
+
+@respx.mock
+def test_failed_export_job_removes_partial_file(tmp_path):
+    _mock_date("2024-01-01", b"tif-1")
+    respx.get(url__regex=RASTER_URL.format(date="2024-01-02")).mock(side_effect=GeoServerUnavailable())
+    manager = ExportJobManager(directory=str(tmp_path), workers=1)
+
+    with patch("routes.get_geoserver_raster.export_jobs", manager), client:
+        job_id = _export(end_date="2024-01-02", mode="job").json()["job_id"]
+        assert _wait_for_job(job_id)["status"] == "failed"
+
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_export_jobs_sweep_stale_files_on_start(tmp_path):
+    stale = tmp_path / "old-job.zip.part"
+    stale.write_bytes(b"partial")
+    old = time.time() - 7200
+    os.utime(stale, (old, old))
+    fresh = tmp_path / "recent-job.zip"
+    fresh.write_bytes(b"done")
+    manager = ExportJobManager(directory=str(tmp_path), workers=1, ttl_seconds=3600)
+
+    async def run():
+        manager.start()
+        await manager.stop()
+
+    asyncio.run(run())
+    assert list(tmp_path.iterdir()) == [fresh]
+
+
+def _geotiff_bytes(data):
+    with MemoryFile() as memfile:
+        with memfile.open(driver="GTiff", height=data.shape[0], width=data.shape[1], count=1,
+                          dtype=data.dtype, crs="EPSG:4326",
+                          transform=from_origin(-76.0, 6.0, 1.0, 1.0)) as dst:
+            dst.write(data, 1)
+        return memfile.read()
+
+
+def test_clip_raster_fetches_geometry_once():
+    geometry_cache.clear()
+    mask_cache.clear()
+    session = MagicMock()
+    # L-shape over rows/cols 1..2 of the 4x4 grid, leaving out pixel (2, 2)
+    session.get.return_value.json.return_value = {"features": [{"geometry": {
+        "type": "Polygon",
+        "coordinates": [[[-75.0, 5.0], [-73.0, 5.0], [-73.0, 4.0], [-74.0, 4.0],
+                         [-74.0, 3.0], [-75.0, 3.0], [-75.0, 5.0]]],
+    }}]}
+    clip = ClipConfig(enabled=True, geoserver={"workspace": "aclimate", "layer": "boundaries",
+                                                "cql_filter": "name = 'Cauca'"})
+    raster_bytes = _geotiff_bytes(np.arange(16, dtype="float32").reshape(4, 4))
+
+    with patch("services.clip.get_geoserver_session", return_value=session):
+        clipped = [clip_raster(raster_bytes, clip) for _ in range(3)]
+
+    session.get.assert_called_once()
+    assert "CQL_FILTER=name+%3D+%27Cauca%27" in session.get.call_args.args[0]
+    with MemoryFile(clipped[0]) as memfile:
+        with memfile.open() as raster:
+            band = raster.read(1)
+            assert raster.transform.c == -75.0 and raster.transform.f == 5.0
+    np.testing.assert_array_equal(band, [[5, 6], [9, np.nan]])
+
+
+def test_geometry_cache_is_bounded_and_drops_expired_entries():
+    cache = ClipGeometryCache(ttl_seconds=60, max_entries=2)
+    fetched = []
+
+    def fetch(workspace, layer, cql_filter=None):
+        fetched.append(cql_filter)
+        return [{"type": "Point", "coordinates": [0, 0]}]
+
+    with patch("services.clip.fetch_clip_geometries", side_effect=fetch):
+        for cql_filter in ("a", "b", "a", "c", "a", "b"):
+            cache.get("aclimate", "boundaries", cql_filter)
+        # "b" was the least recently used when "c" arrived
+        assert fetched == ["a", "b", "c", "b"]
+        assert len(cache._entries) == 2
+        assert cache._key_locks == {}
+
+        cache.ttl_seconds = 0
+        cache.get("aclimate", "boundaries", "d")
+        assert list(cache._entries) == []
+
+
+def test_clip_raster_uint8_uses_in_range_nodata():
+    geometry_cache.clear()
+    mask_cache.clear()
+    session = MagicMock()
+    session.get.return_value.json.return_value = {"features": [{"geometry": {
+        "type": "Polygon",
+        "coordinates": [[[-75.0, 5.0], [-73.0, 5.0], [-73.0, 4.0], [-74.0, 4.0],
+                         [-74.0, 3.0], [-75.0, 3.0], [-75.0, 5.0]]],
+    }}]}
+    clip = ClipConfig(enabled=True, geoserver={"workspace": "aclimate", "layer": "boundaries"})
+    raster_bytes = _geotiff_bytes(np.arange(16, dtype="uint8").reshape(4, 4))
+
+    with patch("services.clip.get_geoserver_session", return_value=session):
+        clipped = clip_raster(raster_bytes, clip)
+
+    with MemoryFile(clipped) as memfile:
+        with memfile.open() as raster:
+            assert raster.nodata == 255
+            np.testing.assert_array_equal(raster.read(1), [[5, 6], [9, 255]])
+
+
+def test_clip_raster_reads_only_the_mask_window():
+    geometry_cache.clear()
+    mask_cache.clear()
+    session = MagicMock()
+    # Triangle over columns 100..399 and rows 200..499 of a 600x600 grid with 0.01° pixels
+    polygon = {"type": "Polygon", "coordinates": [[[-75.0, 4.0], [-72.0, 4.0], [-75.0, 1.0], [-75.0, 4.0]]]}
+    session.get.return_value.json.return_value = {"features": [{"geometry": polygon}]}
+    clip = ClipConfig(enabled=True, geoserver={"workspace": "aclimate", "layer": "boundaries"})
+    data = np.random.rand(600, 600).astype("float32")
+    with MemoryFile() as memfile:
+        with memfile.open(driver="GTiff", height=600, width=600, count=1, dtype="float32",
+                          crs="EPSG:4326", transform=from_origin(-76.0, 6.0, 0.01, 0.01)) as dst:
+            dst.write(data, 1)
+        raster_bytes = memfile.read()
+
+    reads = []
+    original_read = DatasetReader.read
+
+    def spy_read(self, *args, **kwargs):
+        reads.append(kwargs.get("window"))
+        return original_read(self, *args, **kwargs)
+
+    with patch("services.clip.get_geoserver_session", return_value=session), \
+         patch.object(DatasetReader, "read", spy_read):
+        clipped = clip_raster(raster_bytes, clip)
+
+    assert reads == [Window(100, 200, 300, 300)]
+
+    # Same pixels as masking a full read, then cropping to the window
+    inside = geometry_mask([polygon], out_shape=(600, 600),
+                           transform=from_origin(-76.0, 6.0, 0.01, 0.01), invert=True)
+    expected = np.where(inside, data, np.nan)[200:500, 100:400]
+    with MemoryFile(clipped) as memfile:
+        with memfile.open() as raster:
+            assert raster.block_shapes == [(256, 256)]
+            assert (raster.transform.c, raster.transform.f) == pytest.approx((-75.0, 4.0))
+            np.testing.assert_array_equal(raster.read(1), expected)
+
+
+@respx.mock
+def test_raster_export_cog():
+    _mock_date("2024-01-01", _geotiff_bytes(np.random.rand(600, 600).astype("float32")))
+
+    response = _export(end_date="2024-01-01", output_format="cog")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "image/tiff"
+    with MemoryFile(response.content) as memfile:
+        with memfile.open() as raster:
+            assert raster.tags(ns="IMAGE_STRUCTURE")["LAYOUT"] == "COG"
+            assert raster.block_shapes == [(512, 512)]
+            assert raster.overviews(1)
+
+
+@respx.mock
+def test_raster_export_netcdf(tmp_path):
+    for day in (1, 2, 3):
+        _mock_date(f"2024-01-0{day}", _geotiff_bytes(np.full((4, 4), day, dtype="float32")))
+
+    response = _export(output_format="netcdf")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-netcdf"
+
+    path = tmp_path / "cube.nc"
+    path.write_bytes(response.content)
+    with netCDF4.Dataset(path) as cube:
+        assert cube["precipitation"].shape == (3, 4, 4)
+        assert cube["precipitation"].chunking() == [1, 4, 4]
+        assert list(cube["time"][:]) == [19723, 19724, 19725]
+        assert cube["lon"][0] == -75.5 and cube["lat"][0] == 5.5
+        np.testing.assert_array_equal(cube["precipitation"][2], np.full((4, 4), 3))
+
+
+@respx.mock
+def test_raster_export_netcdf_store_named_like_a_coordinate(tmp_path):
+    _mock_date("2024-01-01", _geotiff_bytes(np.full((4, 4), 1, dtype="float32")))
+
+    response = _export(store="time", end_date="2024-01-01", output_format="netcdf")
+    assert response.status_code == 200
+
+    path = tmp_path / "cube.nc"
+    path.write_bytes(response.content)
+    with netCDF4.Dataset(path) as cube:
+        assert cube["time_data"].shape == (1, 4, 4)
+        assert list(cube["time"][:]) == [19723]
@@ -1,25 +1,25 @@
+import json
 import pytest
 from datetime import date
-from unittest.mock import patch
+from unittest.mock import patch, MagicMock
 
-from conftest import client, MockLocation, MockMeasure, MockRecord
+from conftest import client, MockHistoricalDateRow
 
 
 @pytest.fixture
-def mock_monthly_data():
-    loc = MockLocation(1, "Palmira", "EXT1", "palmira", True, None)
-    m1 = MockMeasure(1, "Precipitación", "ppt", "mm")
-    m2 = MockMeasure(2, "Temperatura", "tavg", "°C")
-
+def mock_monthly_rows():
     return [
-        MockRecord(1, 1, loc, 1, m1, date(2025, 5, 1), 100.0),
-        MockRecord(2, 1, loc, 2, m2, date(2025, 5, 1), 26.5),
-        MockRecord(3, 1, loc, 1, m1, date(2025, 6, 1), 150.0),
+        MockHistoricalDateRow(1, 1, "Palmira", 1, "Precipitación", "ppt", "mm", date(2025, 5, 1), 100.0),
+        MockHistoricalDateRow(2, 1, "Palmira", 2, "Temperatura", "tavg", "°C", date(2025, 5, 1), 26.5),
     ]
 
 
-def test_get_historical_monthly_by_date_range_all_measures(mock_monthly_data):
-    with patch("aclimate_v3_orm.services.ClimateHistoricalMonthlyService.get_by_location_id", return_value=mock_monthly_data):
+def test_get_historical_monthly_by_date_range_all_measures(mock_monthly_rows):
+    with patch("services.climate_historical.SessionLocal") as mock_session_local:
+        mock_session = MagicMock()
+        mock_session_local.return_value = mock_session
+        mock_session.execute.return_value.all.return_value = mock_monthly_rows
+
         response = client.get(
             "/historical-monthly/by-date-range-all-measures",
             params={
@@ -46,5 +46,31 @@ def test_get_historical_monthly_by_date_range_all_measures(mock_monthly_data):
             assert "date" in record
             assert "value" in record
 
-        dates = [r["date"] for r in data]
-        assert "2025-06-01" not in dates
\ No newline at end of file
+        mock_session.execute.assert_called_once()
+        stmt = mock_session.execute.call_args[0][0]
+        sql = str(stmt.compile(compile_kwargs={"literal_binds": True}))
+        assert "IN (1)" in sql
+        assert "BETWEEN '2025-05-01' AND '2025-05-31'" in sql
+
+
+def test_get_historical_monthly_streams_ndjson(mock_monthly_rows):
+    with patch("services.climate_historical.SessionLocal") as mock_session_local:
+        mock_session = MagicMock()
+        mock_session_local.return_value = mock_session
+        mock_session.execute.return_value.partitions.return_value = [mock_monthly_rows]
+
+        response = client.get(
+            "/historical-monthly/by-date-range-all-measures",
+            params={"location_ids": "1", "start_date": "2025-05-01", "end_date": "2025-05-31"},
+            headers={"Accept": "application/x-ndjson"}
+        )
+
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("application/x-ndjson")
+        lines = [json.loads(line) for line in response.text.splitlines()]
+        assert [line["measure_short_name"] for line in lines] == ["ppt", "tavg"]
+        assert lines[0]["date"] == "2025-05-01"
+
+        stmt = mock_session.execute.call_args[0][0]
+        assert stmt.get_execution_options()["stream_results"] is True
+        mock_session.execute.return_value.all.assert_not_called()
@@ -0,0 +1,271 @@
+import asyncio
+import base64
+import threading
+import time
+from datetime import datetime, timedelta
+
+from unittest.mock import patch
+
+import jwt
+import pytest
+import requests_mock
+from fastapi import HTTPException
+from fastapi.security import HTTPAuthorizationCredentials
+from jose import jwt as jose_jwt
+
+from conftest import client
+from dependencies.auth_dependencies import VerifiedTokenCache, get_current_user, token_cache
+from services.jwks import JWKSet, JWKSKeyStore, jwks_store
+
+KEYCLOAK_URL = "https://keycloak.test.aclimate.org"
+JWKS_URL = f"{KEYCLOAK_URL}/realms/aclimate/protocol/openid-connect/certs"
+SECRET = b"a-test-secret-of-at-least-32-bytes!"
+
+
+@pytest.fixture(autouse=True)
+def keycloak_env(monkeypatch):
+    monkeypatch.setenv("KEYCLOAK_URL", KEYCLOAK_URL)
+    monkeypatch.setenv("REALM_NAME", "aclimate")
+    monkeypatch.setenv("CLIENT_ID", "dummy-client")
+    jwks_store.clear()
+    token_cache.clear()
+    yield
+    jwks_store.clear()
+    token_cache.clear()
+
+
+def _jwk(kid, secret=SECRET):
+    k = base64.urlsafe_b64encode(secret).rstrip(b"=").decode()
+    return {"kid": kid, "kty": "oct", "alg": "HS256", "k": k}
+
+
+def _token(kid, secret=SECRET):
+    return jwt.encode(
+        {
+            "sub": "user123",
+            "aud": "account",
+            "iss": f"{KEYCLOAK_URL}/realms/aclimate",
+            "exp": datetime.utcnow() + timedelta(minutes=5),
+            "resource_access": {"dummy-client": {"roles": ["admin"]}},
+        },
+        key=secret,
+        algorithm="HS256",
+        headers={"kid": kid},
+    )
+
+
+def _validate(token):
+    return client.get("/auth/token/validate", headers={"Authorization": f"Bearer {token}"})
+
+
+def test_validate_token_uses_cached_keys():
+    with requests_mock.Mocker() as m:
+        m.get(JWKS_URL, json={"keys": [_jwk("key-1")]})
+        for _ in range(3):
+            response = _validate(_token("key-1"))
+            assert response.status_code == 200
+        assert m.call_count == 1
+
+    payload = response.json()["payload"]
+    assert payload["sub"] == "user123"
+    assert payload["client_roles"] == ["admin"]
+
+
+def test_unknown_kid_refetches_keys(monkeypatch):
+    monkeypatch.setattr(jwks_store, "min_refetch_seconds", 0)
+    with requests_mock.Mocker() as m:
+        m.get(JWKS_URL, [{"json": {"keys": [_jwk("key-1")]}},
+                         {"json": {"keys": [_jwk("key-1"), _jwk("key-2")]}}])
+        assert _validate(_token("key-1")).status_code == 200
+        # Key rotated in Keycloak
+        assert _validate(_token("key-2")).status_code == 200
+        assert m.call_count == 2
+
+
+def test_stale_keys_are_served_while_refreshing():
+    store = JWKSKeyStore(ttl_seconds=0)
+    with requests_mock.Mocker() as m:
+        m.get(JWKS_URL, [{"json": {"keys": [_jwk("key-1")]}},
+                         {"json": {"keys": [_jwk("key-2")]}}])
+        first = store.get_key_set()
+        # Expired: the old keys are returned and a refresh starts in the background
+        assert store.get_key_set() is first
+        deadline = time.monotonic() + 2
+        while store.get_key_set() is first and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert "key-2" in store.get_key_set().by_kid
+
+
+def test_concurrent_refreshes_share_one_fetch():
+    store = JWKSKeyStore()
+    release = threading.Event()
+    calls = []
+
+    def slow_fetch(url):
+        calls.append(url)
+        release.wait(2)
+        return JWKSet([_jwk("key-1")], time.monotonic())
+
+    with patch.object(store, "_fetch", side_effect=slow_fetch):
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(store.refresh(JWKS_URL)))
+                   for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        time.sleep(0.1)
+        release.set()
+        for thread in threads:
+            thread.join()
+
+    assert len(calls) == 1
+    assert len({id(result) for result in results}) == 1
+
+
+def test_last_good_keys_served_when_keycloak_is_down():
+    store = JWKSKeyStore(min_refetch_seconds=0)
+    with requests_mock.Mocker() as m:
+        m.get(JWKS_URL, [{"json": {"keys": [_jwk("key-1")]}}, {"status_code": 502}])
+        assert store.get_signing_key("key-1", "HS256") is not None
+        # Unknown kid refetch fails: no error, the cached keys stay in use
+        assert store.get_signing_key("key-2", "HS256") is None
+        assert m.call_count == 2
+        assert store.get_signing_key("key-1", "HS256") is not None
+
+
+def test_unknown_kids_during_outage_share_one_fetch():
+    store = JWKSKeyStore(min_refetch_seconds=60)
+    release = threading.Event()
+    calls = []
+
+    def failing_fetch(url):
+        calls.append(url)
+        release.wait(2)
+        raise HTTPException(status_code=503, detail="Keycloak is down")
+
+    # Cached keys and no recent fetch attempt, so an unknown kid may refetch
+    store._sets[JWKS_URL] = JWKSet([_jwk("key-1")], time.monotonic())
+
+    with patch.object(store, "_fetch", side_effect=failing_fetch):
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(store.get_signing_key("forged", "HS256")))
+                   for _ in range(10)]
+        for thread in threads:
+            thread.start()
+        time.sleep(0.1)
+        release.set()
+        for thread in threads:
+            thread.join()
+        # The failed attempt throttles later unknown kids too
+        assert store.get_signing_key("forged-2", "HS256") is None
+
+    assert len(calls) == 1
+    assert results == [None] * 10
+    assert store.get_signing_key("key-1", "HS256") is not None
+
+
+def test_failed_first_fetch_is_shared_and_throttled():
+    store = JWKSKeyStore(min_refetch_seconds=60)
+    release = threading.Event()
+    calls = []
+
+    def failing_fetch(url):
+        calls.append(url)
+        release.wait(2)
+        raise HTTPException(status_code=503, detail="Keycloak is down")
+
+    def get_key_set(errors):
+        try:
+            store.get_key_set(JWKS_URL)
+        except HTTPException as e:
+            errors.append(e.status_code)
+
+    with patch.object(store, "_fetch", side_effect=failing_fetch):
+        errors = []
+        threads = [threading.Thread(target=get_key_set, args=(errors,)) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        time.sleep(0.1)
+        release.set()
+        for thread in threads:
+            thread.join()
+        get_key_set(errors)
+
+    assert len(calls) == 1
+    assert errors == [503] * 6
+
+
+def test_malformed_jwks_keeps_the_last_good_keys():
+    store = JWKSKeyStore(min_refetch_seconds=0)
+    with requests_mock.Mocker() as m:
+        m.get(JWKS_URL, [{"json": {"keys": [_jwk("key-1")]}},
+                         {"text": "<html>maintenance</html>"},
+                         {"json": {"error": "no keys"}}])
+        assert store.get_signing_key("key-1", "HS256") is not None
+        assert store.get_signing_key("key-2", "HS256") is None
+        assert store.get_signing_key("key-3", "HS256") is None
+        assert m.call_count == 3
+        assert store.get_signing_key("key-1", "HS256") is not None
+
+
+def test_background_refresher_survives_unexpected_errors():
+    store = JWKSKeyStore(refresh_seconds=0.01, retry_seconds=0.01)
+    calls = []
+
+    def refresh(url):
+        calls.append(url)
+        if len(calls) == 1:
+            raise RuntimeError("unexpected")
+        return JWKSet([_jwk("key-1")], time.monotonic())
+
+    async def run():
+        store.start()
+        await asyncio.sleep(0.1)
+        assert not store._task.done()
+        await store.stop()
+
+    with patch.object(store, "refresh", side_effect=refresh):
+        asyncio.run(run())
+    assert len(calls) >= 2
+
+
+def test_background_refresher_renews_keys():
+    store = JWKSKeyStore(refresh_seconds=0.01, retry_seconds=0.01)
+
+    async def run():
+        store.start()
+        await asyncio.sleep(0.2)
+        await store.stop()
+
+    with requests_mock.Mocker() as m:
+        m.get(JWKS_URL, [{"status_code": 503}, {"json": {"keys": [_jwk("key-1")]}},
+                         {"json": {"keys": [_jwk("key-2")]}}])
+        asyncio.run(run())
+        assert m.call_count >= 3
+
+    # Keys were fetched outside any request and are fresh
+    assert "key-2" in store.get_key_set(JWKS_URL).by_kid
+
+
+def test_get_current_user_caches_verified_claims():
+    credentials = HTTPAuthorizationCredentials(scheme="Bearer", credentials=_token("key-1"))
+    with requests_mock.Mocker() as m, \
+            patch("dependencies.auth_dependencies.jwt.decode", wraps=jose_jwt.decode) as decode:
+        m.get(JWKS_URL, json={"keys": [_jwk("key-1")]})
+        first = get_current_user(credentials)
+        first["resource_access"]["dummy-client"]["roles"].append("mutated")
+        second = get_current_user(credentials)
+
+    assert decode.call_count == 1
+    assert second["token_type"] == "user"
+    assert second["resource_access"]["dummy-client"]["roles"] == ["admin"]
+
+
+def test_token_cache_expires_and_is_bounded():
+    cache = VerifiedTokenCache(max_entries=2)
+    cache.put("expired", {"exp": time.time() - 1})
+    assert cache.get("expired") is None
+
+    for token in ("a", "b", "c"):
+        cache.put(token, {"exp": time.time() + 60})
+    assert cache.get("a") is None
+    assert cache.get("c") is not None
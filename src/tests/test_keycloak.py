@@ -0,0 +1,71 @@
+import asyncio
+import os
+import sys
+
+import pytest
+import respx
+from fastapi import HTTPException
+from httpx import Response
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from services.keycloak import ClientTokenManager, get_admin_url
+
+TOKEN_URL = "https://keycloak.test.aclimate.org/realms/aclimate/protocol/openid-connect/token"
+
+
+@pytest.fixture(autouse=True)
+def keycloak_env(monkeypatch):
+    monkeypatch.setenv("KEYCLOAK_URL", "https://keycloak.test.aclimate.org")
+    monkeypatch.setenv("REALM_NAME", "aclimate")
+
+
+@respx.mock
+def test_client_token_is_cached_and_fetched_once():
+    manager = ClientTokenManager(refresh_margin=30)
+    route = respx.post(TOKEN_URL).mock(
+        return_value=Response(200, json={"access_token": "admin-token", "expires_in": 300})
+    )
+
+    async def run():
+        # Concurrent callers share one grant, later callers hit the cache
+        tokens = await asyncio.gather(*(manager.get_token("dummy-client", "secret") for _ in range(10)))
+        tokens.append(await manager.get_token("dummy-client", "secret"))
+        return tokens
+
+    assert asyncio.run(run()) == ["admin-token"] * 11
+    assert route.call_count == 1
+    assert manager.grants == 1
+
+
+@respx.mock
+def test_client_token_is_refreshed_before_expiry():
+    manager = ClientTokenManager(refresh_margin=30)
+    route = respx.post(TOKEN_URL).mock(side_effect=[
+        Response(200, json={"access_token": "first", "expires_in": 0}),
+        Response(200, json={"access_token": "second", "expires_in": 300}),
+    ])
+
+    async def run():
+        return [await manager.get_token("dummy-client", "secret") for _ in range(3)]
+
+    assert asyncio.run(run()) == ["first", "second", "second"]
+    assert route.call_count == 2
+
+
+@respx.mock
+def test_rejected_client_credentials_are_not_cached():
+    manager = ClientTokenManager()
+    route = respx.post(TOKEN_URL).mock(return_value=Response(401, json={"error": "unauthorized_client"}))
+
+    async def run():
+        for _ in range(2):
+            with pytest.raises(HTTPException) as exc_info:
+                await manager.get_token("dummy-client", "wrong")
+            assert exc_info.value.status_code == 401
+
+    asyncio.run(run())
+    assert route.call_count == 2
+
+
+def test_admin_url_points_at_the_realm_admin_api():
+    assert get_admin_url() == "https://keycloak.test.aclimate.org/admin/realms/aclimate"